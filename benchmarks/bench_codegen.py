@@ -0,0 +1,36 @@
+"""Benchmark of the generated functions against the table loops of the DFA engine"""
+
+from time import perf_counter
+from regex.compiled import CompiledRegex
+
+
+CASES = [
+    (r"\d{3}-\d{3}-\d{4}", ["555-123-4567", "555-123-456", "5551234567", "555-abc-4567"]),
+    (r"[A-Z]{2}\d{2}[A-Z0-9]{4}\d{7}([A-Z0-9]?){0,16}", ["GB82WEST12345698765432", "GB82-WEST", "PL6110901014"]),
+    (r"\d+", ["1234567890" * 5, "12a"]),
+    (r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})", ["adam.kowalski@gmail.pl", "notanemail@", "x@y.io"]),
+]
+SEARCH_TEXT = "user adam.kowalski@gmail.pl called 555-123-4567 from GB82WEST12345698765432 " * 4
+ROUNDS = 5000
+
+
+def timed(function, texts: list[str]) -> float:
+    begin = perf_counter()
+    for _ in range(ROUNDS):
+        for text in texts:
+            function(text)
+    return perf_counter() - begin
+
+
+def main():
+    print(f"{'pattern':<50} {'method':<11} {'table [us]':>11} {'codegen [us]':>13} {'speedup':>8}")
+    for pattern, texts in CASES:
+        table, generated = CompiledRegex(pattern, engine="dfa"), CompiledRegex(pattern, engine="dfa", codegen=True)
+        for method, inputs in (("full_match", texts), ("match", texts), ("search", [SEARCH_TEXT])):
+            loop = timed(getattr(table, method), inputs) / ROUNDS / len(inputs) * 1e6
+            fast = timed(getattr(generated, method), inputs) / ROUNDS / len(inputs) * 1e6
+            print(f"{pattern[:50]:<50} {method:<11} {loop:>11.2f} {fast:>13.2f} {loop / fast:>7.1f}x")
+
+
+if __name__ == '__main__':
+    main()
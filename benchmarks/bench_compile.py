@@ -0,0 +1,34 @@
+"""Benchmark of the epsilon closure computation on growing ENFAs"""
+
+from time import perf_counter
+from regex.automata import ENFA, NFA
+
+
+PATTERNS = [
+    r"[a-z0-9]{2,40}",
+    r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})",
+    r"(ab?|cd*){500}",
+    r"(ab?|cd*){1000}",
+    r"(ab?|cd*){2000}",
+    r"(ab?|cd*){4000}",
+]
+
+
+def main():
+    print(f"{'pattern':<50} {'states':>8} {'closures [s]':>13} {'get_nfa [s]':>12}")
+    for pattern in PATTERNS:
+        enfa = ENFA.get_enfa(pattern)
+
+        begin = perf_counter()
+        NFA._compute_e_closures(enfa.states, enfa.transitions)
+        closures_time = perf_counter() - begin
+
+        begin = perf_counter()
+        NFA.get_nfa(enfa)
+        nfa_time = perf_counter() - begin
+
+        print(f"{pattern:<50} {len(enfa.states):>8} {closures_time:>13.4f} {nfa_time:>12.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,45 @@
+"""Benchmark of determinization through the NFA, the on-the-fly subset construction and character classes"""
+
+from time import perf_counter
+from tracemalloc import start, stop, get_traced_memory, reset_peak
+from regex.automata import ENFA, NFA, DFA, CharClasses
+
+
+PATTERNS = [
+    r"[a-z0-9]{2,40}",
+    r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})",
+    r"(www\.)?[-A-Za-z0-9_\.]+\.(com|pl|io)",
+    r"(ab?|cd*){200}",
+    r"\S+\s.\W\D{1,3}",
+]
+
+
+def compressed(pattern: str) -> DFA:
+    enfa = ENFA.get_enfa(pattern)
+    classes = CharClasses.from_transitions(enfa.transitions)
+    return DFA.from_enfa(enfa.compress(classes), classes)
+
+
+def measure(build) -> (float, int):
+    reset_peak()
+    begin = perf_counter()
+    build()
+    elapsed = perf_counter() - begin
+    return elapsed, get_traced_memory()[1]
+
+
+def main():
+    start()
+    print(f"{'pattern':<50} {'via NFA [s]':>12} {'peak [kB]':>10} {'from ENFA [s]':>14} {'peak [kB]':>10} "
+          f"{'classes [s]':>12} {'peak [kB]':>10}")
+    for pattern in PATTERNS:
+        nfa_time, nfa_peak = measure(lambda: DFA.get_dfa(NFA.get_nfa(ENFA.get_enfa(pattern))))
+        enfa_time, enfa_peak = measure(lambda: DFA.from_enfa(ENFA.get_enfa(pattern)))
+        classes_time, classes_peak = measure(lambda: compressed(pattern))
+        print(f"{pattern:<50} {nfa_time:>12.4f} {nfa_peak // 1024:>10} {enfa_time:>14.4f} {enfa_peak // 1024:>10} "
+              f"{classes_time:>12.4f} {classes_peak // 1024:>10}")
+    stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,49 @@
+"""Benchmark of the time import regex takes, and of the modules it loads"""
+
+import sys
+from os import environ
+from statistics import median
+from subprocess import run
+from tempfile import TemporaryDirectory
+
+
+RUNS = 10
+# loaded only by the features needing them
+HEAVY = ["numpy", "concurrent.futures", "multiprocessing", "tempfile", "hashlib", "pathlib"]
+
+
+def import_times(environment: dict[str, str]) -> dict[str, tuple[int, int]]:
+    """Returns the self and cumulative microseconds spent importing each module in a fresh interpreter."""
+    process = run([sys.executable, "-X", "importtime", "-c", "import regex"],
+                  env=environment, capture_output=True, text=True, check=True)
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        times[name.strip()] = int(own), int(cumulative)
+    return times
+
+
+def main():
+    with TemporaryDirectory() as bytecode:
+        # the bytecode is written to a directory of its own, so that the runs after the first one
+        # measure loading the package, as its users see it, rather than compiling its sources
+        environment = dict(environ, PYTHONPYCACHEPREFIX=bytecode)
+        environment.pop("PYTHONDONTWRITEBYTECODE", None)
+        import_times(environment)
+        runs = [import_times(environment) for _ in range(RUNS)]
+
+    print(f"import regex: {median(times['regex'][1] for times in runs) / 1000:.1f} ms (median of {RUNS} runs)")
+    print(f"\n{'module':<30} {'self [ms]':>10} {'total [ms]':>11}")
+    modules = sorted(runs[0], key=lambda name: -median(times[name][1] for times in runs))
+    for name in modules[:15]:
+        own = median(times[name][0] for times in runs)
+        cumulative = median(times[name][1] for times in runs)
+        print(f"{name:<30} {own / 1000:>10.1f} {cumulative / 1000:>11.1f}")
+    loaded = [name for name in HEAVY if name in runs[0]]
+    print(f"\nheavy modules loaded: {', '.join(loaded) if loaded else 'none'}")
+
+
+if __name__ == '__main__':
+    main()
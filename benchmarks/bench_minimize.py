@@ -0,0 +1,32 @@
+"""Benchmark of the DFA minimizers on alternations of many keywords"""
+
+from time import perf_counter
+from random import Random
+from regex.automata import ENFA, NFA, DFA
+
+
+def keywords(count: int, seed: int = 0) -> str:
+    rng = Random(seed)
+    words = {''.join(rng.choice('abcdefghij') for _ in range(rng.randint(4, 8))) for _ in range(count)}
+    return '|'.join(sorted(words))
+
+
+def main():
+    print(f"{'keywords':>8} {'states':>8} {'minimal':>8} {'hopcroft [s]':>13} {'relations [s]':>14}")
+    for count in (25, 50, 100, 200):
+        dfa = DFA.get_dfa(NFA.get_nfa(ENFA.get_enfa(keywords(count))))
+
+        begin = perf_counter()
+        minimal = dfa.minimalize("hopcroft")
+        hopcroft_time = perf_counter() - begin
+
+        begin = perf_counter()
+        dfa.minimalize("relations")
+        relations_time = perf_counter() - begin
+
+        print(f"{count:>8} {len(dfa.states):>8} {len(minimal.states):>8} "
+              f"{hopcroft_time:>13.4f} {relations_time:>14.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,32 @@
+"""Benchmark of packing and unpacking compiled regexes against pickling them"""
+
+from pickle import dumps, loads
+from time import perf_counter
+from regex.compiled import CompiledRegex
+
+
+PATTERNS = [
+    r"id=\d+",
+    r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})",
+    r"[a-z0-9]{2,40}",
+    r"(a|b|c|d|e)*a(a|b|c|d|e){11}[a-z]",
+]
+
+
+def timed(function, *args) -> float:
+    begin = perf_counter()
+    function(*args)
+    return perf_counter() - begin
+
+
+def main():
+    print(f"{'pattern':<50} {'states':>7} {'pickle [B]':>11} {'loads [ms]':>11} {'pack [B]':>9} {'unpack [ms]':>12}")
+    for pattern in PATTERNS:
+        regex = CompiledRegex(pattern, engine="dfa")
+        pickled, packed = dumps(regex.dfa), regex.pack()
+        print(f"{pattern:<50} {len(regex.dfa.accepting):>7} {len(pickled):>11} {timed(loads, pickled) * 1000:>11.3f} "
+              f"{len(packed):>9} {timed(CompiledRegex.unpack, packed) * 1000:>12.3f}")
+
+
+if __name__ == '__main__':
+    main()
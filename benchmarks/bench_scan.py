@@ -0,0 +1,84 @@
+"""Benchmark of the scanning methods of CompiledRegex on a synthetic log"""
+
+from time import perf_counter
+from random import Random
+from os import cpu_count
+from regex.compiled import CompiledRegex
+
+
+def make_log(lines: int, seed: int = 0) -> str:
+    rng = Random(seed)
+    levels = ["INFO", "DEBUG", "WARN", "ERROR"]
+    words = ["request", "served", "user", "cache", "miss", "timeout", "retry", "db", "query", "ok"]
+    out = []
+    for i in range(lines):
+        message = ' '.join(rng.choice(words) for _ in range(rng.randint(3, 10)))
+        out.append(f"2024-01-{i % 28 + 1:02d} {rng.choice(levels)}: {message} id={rng.randint(0, 99999)}")
+    return '\n'.join(out)
+
+
+PATTERNS = [
+    r"ERROR: [a-z ]+",
+    r"id=\d+",
+    r"\w+",
+    r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})",
+    r"id=9999\d",
+    r"[A-Z]+ \d",
+    r"[a-z]+=\d+",
+]
+
+# patterns whose threads stay alive for long, quadratic for a scan that follows every start position
+LONG_MATCHES = [
+    (r"a|a*b", "a" * 20000),
+    (r"\w+", "x" * 20000),
+    (r"(a|b)*c", "ab" * 10000),
+]
+
+
+# find_all on a log of PARALLEL_LINES lines with a pool of processes
+PARALLEL_LINES = 100000
+PARALLEL_PATTERNS = [r"id=\d+", r"\w+"]
+
+# full_match_many against a loop of full_match calls on short identifiers
+BATCH_PATTERN = r"[a-z]{2,4}-\d{3,6}"
+BATCH_SIZES = [100, 10000, 1000000]
+
+
+def timed(function, *args) -> float:
+    begin = perf_counter()
+    function(*args)
+    return perf_counter() - begin
+
+
+def main():
+    text = make_log(200)
+    line = text[:text.index('\n')]
+    print(f"text: {len(text)} characters")
+    print(f"{'pattern':<50} {'full_match x1000 [s]':>21} {'search [s]':>11} {'find_all [s]':>13}")
+    for pattern in PATTERNS:
+        regex = CompiledRegex(pattern)
+        full_match_time = timed(lambda: [regex.full_match(line) for _ in range(1000)])
+        search_time = timed(regex.search, text)
+        find_all_time = timed(regex.find_all, text)
+        print(f"{pattern:<50} {full_match_time:>21.4f} {search_time:>11.4f} {find_all_time:>13.4f}")
+    print(f"\n{'pattern':<50} {'text':>21} {'find_all [s]':>25}")
+    for pattern, text in LONG_MATCHES:
+        regex = CompiledRegex(pattern)
+        print(f"{pattern:<50} {len(text):>21} {timed(regex.find_all, text):>25.4f}")
+    text = make_log(PARALLEL_LINES)
+    workers = cpu_count() or 1
+    print(f"\n{'pattern':<50} {'find_all [s]':>21} {f'workers={workers} [s]':>25}")
+    for pattern in PARALLEL_PATTERNS:
+        regex = CompiledRegex(pattern)
+        print(f"{pattern:<50} {timed(regex.find_all, text):>21.4f} {timed(regex.find_all, text, workers):>25.4f}")
+    regex = CompiledRegex(BATCH_PATTERN)
+    rng = Random(0)
+    print(f"\n{'strings':<50} {'full_match loop [s]':>21} {'full_match_many [s]':>25}")
+    for size in BATCH_SIZES:
+        strings = [f"{'abcxyz'[:rng.randint(1, 5)]}-{rng.randint(0, 10 ** 7)}" for _ in range(size)]
+        loop_time = timed(lambda: [regex.full_match(string) is not None for string in strings])
+        print(f"{size:<50} {loop_time:>21.4f} {timed(regex.full_match_many, strings):>25.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,10 @@
-from .compile import CompiledRegex, Match
+from .compiled import CompiledRegex, CompileStage, Match, Scanner
+from . import compile  # the former module of CompiledRegex, calling it calls cache.compile
+from .regex_set import RegexSet
+from .disk_cache import DiskCache, set_cache_dir
+from .cache import PatternCache, CacheInfo, full_match, match, search, find_all, finditer, is_match, \
+    count, purge, cache_info
 
-__all__ = ['CompiledRegex', 'Match']
+__all__ = ['CompiledRegex', 'CompileStage', 'Match', 'Scanner', 'RegexSet', 'PatternCache', 'CacheInfo',
+           'DiskCache', 'compile', 'full_match', 'match', 'search', 'find_all', 'finditer', 'is_match', 'count',
+           'purge', 'cache_info', 'set_cache_dir']
@@ -1,13 +1,64 @@
 """Automata for representing regular expressions"""
 
+import sys
 from typing import Self
-from pickle import dumps, loads
-from .parser import parse
+from array import array
+from mmap import mmap
+from struct import Struct
+from itertools import repeat
+from codecs import register_error
+from .parser import parse, Parser
 from typing import Optional
-import numpy as np
+
+
+DFA_FORMAT_VERSION = 1
+_DFA_MAGIC = b"RXDF"
+_DFA_HEADER = Struct("<4sHHIIiiI")
+_LATIN1 = [chr(code) for code in range(256)]
+_TO_BITS = bytes.maketrans(b"\x00\x01", b"01")
+_FROM_BITS = bytes.maketrans(b"01", b"\x00\x01")
+
+
+def _to_bitmap(flags: bytes) -> bytes:
+    """Packs bytes of 0 and 1 into bits, flags[i] into bit i % 8 of byte i // 8."""
+    return int(bytes(flags).translate(_TO_BITS)[::-1] or b"0", 2).to_bytes((len(flags) + 7) // 8, "little")
+
+
+def _from_bitmap(bitmap: bytes | memoryview, count: int) -> bytes:
+    """Unpacks the first count bits of bitmap written by _to_bitmap into bytes of 0 and 1."""
+    bits = format(int.from_bytes(bitmap, "little"), f"0{count}b")[::-1]
+    return bits.encode().translate(_FROM_BITS)[:count]
+
+
+def _split(view: memoryview, offset: int, lengths: list[int]) -> list[memoryview]:
+    """Cuts view from offset into consecutive sections of the given lengths."""
+    sections = []
+    for length in lengths:
+        sections.append(view[offset:offset + length])
+        offset += length
+    return sections
+
+
+class StateLimitExceeded(Exception):
+    """Raised when the subset construction would build more states than allowed"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"Determinization needs more than {limit} states.")
+        self.limit = limit
+
+
+class RepetitionLimitExceeded(Exception):
+    """Raised when a counted repetition {x,y} would expand into more states than allowed"""
+
+    def __init__(self, states: int, limit: int):
+        super().__init__(f"Counted repetition expands into {states} states, the limit is {limit}.")
+        self.states = states
+        self.limit = limit
 
 
 class ENFA:
+    repetition_limit = 100_000  # states a single counted repetition {x,y} may expand into
+
     def __init__(self, states: set[int] = None,
                  transitions: dict[(int, str), set[int]] = None,
                  start_state: int | None = None,
@@ -16,20 +67,141 @@ class ENFA:
         self.transitions = transitions.copy() if transitions is not None else dict()
         self.start_state = start_state
         self.end_state = end_state
+        self._epsilon_edges: dict[int, set[int]] | None = None
+        self._symbol_edges: dict[int, list[(str, set[int])]] | None = None
+        self._closures: dict[int, frozenset[int]] = dict()
+        self._classes: CharClasses | None = None  # compresses counted repetitions while building
+        self._max_copies: int | None = None  # caps counted repetitions while building a skeleton
 
     def __repr__(self):
         return f"{self.__class__.__name__}(\n    states={self.states},\n    transitions={self.transitions}," \
                f"\n    start_state={self.start_state},\n    end_state={self.end_state}\n)"
 
     @classmethod
-    def get_enfa(cls, regex_input: str) -> Self:
-        parsed_regex = parse(regex_input)
+    def get_enfa(cls, regex_input: str | Parser, classes: 'CharClasses | None' = None) -> Self:
+        """
+        Builds the automaton of regex_input, or of its already parsed form, reading class IDs of classes
+        if they are given. Counted repetitions then paste copies of an already compressed sub-automaton,
+        so node{x,y} costs y times the classes instead of y times the characters of node.
+        """
+        parsed_regex = parse(regex_input) if isinstance(regex_input, str) else regex_input
         enfa_instance = cls()
+        enfa_instance._classes = classes
         enfa_instance.start_state = enfa_instance._create_state()
         enfa_instance.end_state = enfa_instance._build_enfa(parsed_regex.root.repr(),
                                                             enfa_instance.start_state)
+        if classes is not None:
+            enfa_instance = enfa_instance.compress(classes)
         return enfa_instance
 
+    @classmethod
+    def get_skeleton(cls, regex_input: str | Parser) -> Self:
+        """
+        Builds the automaton of regex_input, or of its already parsed form, with every counted repetition
+        pasted at most once. It reads the same characters as the full automaton and tells apart at least
+        the same ones, so its character classes are valid for the full automaton.
+        """
+        parsed_regex = parse(regex_input) if isinstance(regex_input, str) else regex_input
+        enfa_instance = cls()
+        enfa_instance._max_copies = 1
+        enfa_instance.start_state = enfa_instance._create_state()
+        enfa_instance.end_state = enfa_instance._build_enfa(parsed_regex.root.repr(),
+                                                            enfa_instance.start_state)
+        return enfa_instance
+
+    def get_alphabet(self) -> frozenset[str]:
+        return frozenset(letter for _, letter in self.transitions.keys() if letter != "")
+
+    def e_closure(self, states) -> frozenset[int]:
+        """Returns the states reachable from states by epsilon transitions, closures of single states are memoized."""
+        if self._epsilon_edges is None:
+            self._index_transitions()
+        missing = [state for state in states if state not in self._closures]
+        if missing:
+            _epsilon_closures(self._epsilon_edges, missing, self._closures)
+        closures = [self._closures[state] for state in states]
+        if len(closures) == 1:
+            return closures[0]
+        return frozenset().union(*closures)
+
+    def move(self, states: frozenset[int], symbol: str | int) -> frozenset[int]:
+        """Returns the epsilon closed set of states reached from states on symbol."""
+        targets: set[int] = set()
+        for state in states:
+            next_states = self.transitions.get((state, symbol))
+            if next_states:
+                targets.update(next_states)
+        return self.e_closure(targets)
+
+    def moves(self, states: frozenset[int]) -> dict[str, frozenset[int]]:
+        """Returns the epsilon closed set of states reached from states on each symbol that leaves them."""
+        if self._symbol_edges is None:
+            self._index_transitions()
+        targets: dict[str, set[int]] = dict()
+        for state in states:
+            for symbol, next_states in self._symbol_edges.get(state, ()):
+                targets.setdefault(symbol, set()).update(next_states)
+        return {symbol: self.e_closure(next_states) for symbol, next_states in targets.items()}
+
+    def compress(self, classes: 'CharClasses') -> Self:
+        """
+        Returns a copy of the automaton reading class IDs of classes instead of single characters,
+        transitions already reading class IDs are kept.
+        """
+        transitions: dict[(int, str | int), set[int]] = dict()
+        class_of = classes.class_of
+        for (state, symbol), targets in self.transitions.items():
+            if symbol != "" and not isinstance(symbol, int):
+                symbol = class_of.get(symbol, 0)
+            if (state, symbol) in transitions:
+                transitions[(state, symbol)].update(targets)
+            else:
+                transitions[(state, symbol)] = set(targets)
+        return self.__class__(self.states, transitions, self.start_state, self.end_state)
+
+    def reverse(self) -> Self:
+        """Returns the automaton with every transition turned around, reading the reversed language."""
+        transitions: dict[(int, str | int), set[int]] = dict()
+        for (state, symbol), targets in self.transitions.items():
+            for target in targets:
+                transitions.setdefault((target, symbol), set()).add(state)
+        return self.__class__(self.states, transitions, self.end_state, self.start_state)
+
+    @classmethod
+    def join(cls, enfas: list[Self]) -> tuple[Self, list[int]]:
+        """
+        Returns the union of enfas, with state numbers shifted apart, a new start state leading to
+        each of their start states and a new end state reached from each of their end states,
+        together with the state numbers of their end states in the union.
+        """
+        joined = cls()
+        joined.start_state = joined._create_state()
+        ends: list[int] = []
+        for enfa in enfas:
+            offset = max(joined.states) + 1
+            joined.states.update(state + offset for state in enfa.states)
+            for (state, symbol), targets in enfa.transitions.items():
+                joined.transitions[(state + offset, symbol)] = {target + offset for target in targets}
+            joined._add_epsilon_transition(joined.start_state, enfa.start_state + offset)
+            ends.append(enfa.end_state + offset)
+        joined.end_state = max(joined.states) + 1
+        joined.states.add(joined.end_state)
+        for end in ends:
+            joined._add_epsilon_transition(end, joined.end_state)
+        return joined, ends
+
+    def _index_transitions(self) -> None:
+        # set only once complete, threads sharing the automaton must not see a partial index
+        epsilon_edges: dict[int, set[int]] = dict()
+        symbol_edges: dict[int, list[(str, set[int])]] = dict()
+        for (state, symbol), targets in self.transitions.items():
+            if symbol == "":
+                epsilon_edges[state] = targets
+            else:
+                symbol_edges.setdefault(state, []).append((symbol, targets))
+        self._symbol_edges = symbol_edges
+        self._epsilon_edges = epsilon_edges
+
     def _build_enfa(self, node: dict, start_state: int) -> int:
         is_operator = False  # flag for handling '*', '?', '+'
         is_range = False  # flag for handling range - {x,y}
@@ -141,24 +313,49 @@ class ENFA:
     def _handle_node_type(self, node: dict, start_state: int, prev_start_state: int, is_range: bool,
                           is_operator: bool, build_type_func) -> int:
         if is_range:
-            i = 0
-            end_state = self._create_state()
-            prev_end_state = start_state
-
-            while i < node["operator"][1]:
-                if i >= node["operator"][0]:
-                    self._add_epsilon_transition(prev_end_state, end_state)
-
-                prev_end_state = build_type_func(node, prev_end_state)
-                i += 1
-            self._add_epsilon_transition(prev_end_state, end_state)
-            return end_state
+            return self._build_repetition_enfa(node, start_state)
         else:
             end_state = build_type_func(node, start_state)
             if is_operator:
                 end_state = self._handle_operators(prev_start_state, start_state, end_state, node)
             return end_state
 
+    def _build_repetition_enfa(self, node: dict, start_state: int) -> int:
+        """
+        Builds node{x,y} by building node once and pasting y copies of it with shifted state numbers,
+        the copy i + 1 starts in the end state of the copy i.
+        """
+        low, high = node["operator"]
+        if self._max_copies is not None:
+            low, high = min(low, self._max_copies), min(high, self._max_copies)
+        body = self.__class__()
+        body._classes, body._max_copies = self._classes, self._max_copies
+        body.start_state = body._create_state()
+        body.end_state = body._build_enfa({**node, "operator": None}, body.start_state)
+        if high * (len(body.states) - 1) > self.repetition_limit:
+            raise RepetitionLimitExceeded(high * (len(body.states) - 1), self.repetition_limit)
+        if self._classes is not None:
+            body = body.compress(self._classes)
+        # the body start state is numbered 0 and is replaced by the end state of the previous copy
+        edges = [(state, symbol, tuple(targets)) for (state, symbol), targets in body.transitions.items()]
+
+        end_state = self._create_state()
+        prev_end_state = start_state
+        for i in range(high):
+            if i >= low:
+                self._add_epsilon_transition(prev_end_state, end_state)
+            offset = len(self.states) - 1
+            self.states.update(range(offset + 1, offset + len(body.states)))
+            copy = {(prev_end_state if state == 0 else state + offset, symbol):
+                    {prev_end_state if target == 0 else target + offset for target in targets}
+                    for state, symbol, targets in edges}
+            for key in copy.keys() & self.transitions.keys():
+                copy[key].update(self.transitions[key])
+            self.transitions.update(copy)
+            prev_end_state = prev_end_state if body.end_state == 0 else body.end_state + offset
+        self._add_epsilon_transition(prev_end_state, end_state)
+        return end_state
+
     def _handle_operators(self, prev_start_state: int, start_state: int, end_state: int, node: dict) -> int:
         self._add_epsilon_transition(prev_start_state, start_state)
         new_end_state = self._create_state()
@@ -196,6 +393,97 @@ class ENFA:
         self.transitions[(source_state, symbol)].add(target_state)
 
 
+class _ClassTranslation(dict):
+    """str.translate table sending every character missing from it to class 0"""
+
+    def __missing__(self, key: int) -> int:
+        return 0
+
+
+class CharClasses:
+    """
+    Partition of the characters into classes that no transition can tell apart.
+    Class 0 holds every character that no transition reads. There can be at most 65536 classes.
+    """
+
+    def __init__(self, class_of: dict[str, int] = None):
+        self.class_of = class_of.copy() if class_of is not None else dict()
+        self.size = max(self.class_of.values(), default=0) + 1
+        if self.size > 1 << 16:
+            raise ValueError(f"Too many character classes: {self.size}, at most {1 << 16} are supported.")
+        self._translation = _ClassTranslation((ord(ch), class_id) for ch, class_id in self.class_of.items())
+        self._byte_table = self._spare = None
+        if self.size <= 256:
+            self._byte_table = bytes(map(self.class_of.get, _LATIN1, repeat(0, 256)))
+            # characters above chr(255) are encoded as a latin-1 character of class 0, if there is one,
+            # which only works if none of them is read by a transition
+            if 0 in self._byte_table and all(ord(ch) < 256 for ch in self.class_of):
+                self._spare = self._byte_table.rfind(0)
+        self._register_errors()
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._register_errors()
+
+    def _register_errors(self) -> None:
+        if self._spare is not None:
+            replacement = chr(self._spare)
+            register_error(f"regex-class-zero-{self._spare}",
+                           lambda error: (replacement * (error.end - error.start), error.end))
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.class_of})"
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, letter: str) -> int:
+        return self.class_of.get(letter, 0)
+
+    def encode(self, text: str | bytes | bytearray) -> bytes | array:
+        """
+        Returns the class IDs of the characters of text, one byte per character, or an array('H')
+        if there are more than 256 classes. Bytes are read as latin-1 characters.
+        """
+        if self._byte_table is None:
+            if not isinstance(text, str):
+                text = bytes(text).decode('latin-1')
+            # each class ID becomes one UTF-16 code unit
+            letters = array('H', text.translate(self._translation).encode('utf-16-le', 'surrogatepass'))
+            if sys.byteorder != "little":
+                letters.byteswap()
+            return letters
+        if not isinstance(text, str):
+            return bytes(text).translate(self._byte_table)
+        if self._spare is None:
+            return text.translate(self._translation).encode('latin-1')
+        return text.encode('latin-1', f"regex-class-zero-{self._spare}").translate(self._byte_table)
+
+    def members(self, class_id: int) -> frozenset[str]:
+        """Returns the characters of a class, for class 0 only the ones below chr(256) are listed."""
+        if class_id == 0:
+            return frozenset(ch for ch in map(chr, range(256)) if ch not in self.class_of)
+        return frozenset(ch for ch, letter_class in self.class_of.items() if letter_class == class_id)
+
+    @classmethod
+    def from_transitions(cls, transitions: dict[(int, str), set[int]]) -> Self:
+        """Groups characters whose transitions lead from the same states to the same states."""
+        signatures: dict[str, list[(int, frozenset[int])]] = dict()
+        for (state, symbol), targets in transitions.items():
+            if symbol != "":
+                signatures.setdefault(symbol, []).append((state, frozenset(targets)))
+
+        groups: dict[frozenset, list[str]] = dict()
+        for symbol, signature in signatures.items():
+            groups.setdefault(frozenset(signature), []).append(symbol)
+
+        class_of: dict[str, int] = dict()
+        for class_id, members in enumerate(sorted(groups.values(), key=min), start=1):
+            for symbol in members:
+                class_of[symbol] = class_id
+        return cls(class_of)
+
+
 class NFA:
     def __init__(self, states: set[int] = None,
                  transitions: dict[(int, str), set[int]] = None,
@@ -238,28 +526,9 @@ class NFA:
         return nfa_instance
 
     @staticmethod
-    def _compute_e_closures(states: set[int], transitions: dict[(int, str), set[int]]) -> dict[int, set[int]]:
-        transitions = {k: v for k, v in transitions.items() if k[1] == ""}
-        size = len(states)
-        adjacency_matrix = np.full((size, size), False, dtype=bool)
-        state_to_index = {state: index for index, state in enumerate(sorted(states))}
-
-        np.fill_diagonal(adjacency_matrix, True)
-
-        for (u, _), vs in transitions.items():
-            for v in vs:
-                adjacency_matrix[state_to_index[u]][state_to_index[v]] = True
-
-        for k in range(size):
-            for i in range(size):
-                for j in range(size):
-                    adjacency_matrix[i][j] = adjacency_matrix[i][j] or (
-                                adjacency_matrix[i][k] and adjacency_matrix[k][j])
-
-        e_closures = {}
-        for state, index in state_to_index.items():
-            e_closures[state] = set(sorted(states)[i] for i in np.flatnonzero(adjacency_matrix[index]))
-        return e_closures
+    def _compute_e_closures(states: set[int], transitions: dict[(int, str), set[int]]) -> dict[int, frozenset[int]]:
+        epsilon_edges = {k[0]: v for k, v in transitions.items() if k[1] == ""}
+        return _epsilon_closures(epsilon_edges, states, dict())
 
     @staticmethod
     def _compute_end_states(states: set[int], e_closures: dict[int, set[int]], end_state: int) -> set[int]:
@@ -270,29 +539,37 @@ class NFA:
         return end_states
 
     @staticmethod
-    def _compute_transitions(states: set[int], e_closures: dict[int, set[int]],
+    def _compute_transitions(states: set[int], e_closures: dict[int, frozenset[int]],
                              transitions: dict[(int, str), set[int]]) -> dict[(int, str), set[int]]:
+        outgoing: dict[int, list[(str, set[int])]] = dict()
+        for (state, symbol), targets in transitions.items():
+            if symbol != "":
+                outgoing.setdefault(state, []).append((symbol, targets))
+
         nfa_transitions = {}
         for state in states:
-            for symbol in set(k[1] for k in transitions.keys() if k[1] != ""):
-                next_states = set()
-                for current_state in e_closures[state]:
-                    next_states.update(transitions.get((current_state, symbol), set()))
-                if next_states:
-                    nfa_transitions[(state, symbol)] = set().union(*[e_closures[s] for s in next_states])
+            moves: dict[str, set[int]] = dict()
+            for current_state in e_closures[state]:
+                for symbol, targets in outgoing.get(current_state, ()):
+                    moves.setdefault(symbol, set()).update(targets)
+            for symbol, targets in moves.items():
+                nfa_transitions[(state, symbol)] = set().union(*[e_closures[s] for s in targets])
         return nfa_transitions
 
     def _remove_unreachable_states(self):
-        reachable_states = set()
+        outgoing: dict[int, list[set[int]]] = dict()
+        for (state, _), targets in self.transitions.items():
+            outgoing.setdefault(state, []).append(targets)
+
+        reachable_states = {self.start_state}
         stack = [self.start_state]
 
         while stack:
             current_state = stack.pop()
-            reachable_states.add(current_state)
-
-            for symbol in set(k[1] for k in self.transitions.keys() if k[0] == current_state):
-                for next_state in self.transitions.get((current_state, symbol), set()):
+            for targets in outgoing.get(current_state, ()):
+                for next_state in targets:
                     if next_state not in reachable_states:
+                        reachable_states.add(next_state)
                         stack.append(next_state)
 
         unreachable_states = self.states - reachable_states
@@ -304,6 +581,66 @@ class NFA:
         }
 
 
+def _epsilon_closures(epsilon_edges: dict[int, set[int]], roots, closures: dict[int, frozenset[int]]) \
+        -> dict[int, frozenset[int]]:
+    """
+    Extends closures with the epsilon closure of every state reachable from roots.
+
+    Closures are found with an iterative Tarjan traversal of the epsilon edges only, so every
+    strongly connected component is visited once and all of its states share one frozenset.
+    States already present in closures are not visited again.
+    """
+    index: dict[int, int] = dict()
+    low: dict[int, int] = dict()
+    stack: list[int] = []
+    on_stack: set[int] = set()
+
+    for root in roots:
+        if root in closures or root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(epsilon_edges.get(root, ())))]
+
+        while work:
+            state, successors = work[-1]
+            for next_state in successors:
+                if next_state in closures:
+                    continue
+                if next_state not in index:
+                    index[next_state] = low[next_state] = len(index)
+                    stack.append(next_state)
+                    on_stack.add(next_state)
+                    work.append((next_state, iter(epsilon_edges.get(next_state, ()))))
+                    break
+                if next_state in on_stack and index[next_state] < low[state]:
+                    low[state] = index[next_state]
+            else:
+                work.pop()
+                if work and low[state] < low[work[-1][0]]:
+                    low[work[-1][0]] = low[state]
+                if low[state] != index[state]:
+                    continue
+
+                component = set()
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.add(member)
+                    if member == state:
+                        break
+                closure = set(component)
+                for member in component:
+                    for next_state in epsilon_edges.get(member, ()):
+                        if next_state not in closure:
+                            closure.update(closures[next_state])
+                closure = frozenset(closure)
+                for member in component:
+                    closures[member] = closure
+    return closures
+
+
 class DFA:
 
     def __init__(self, states: frozenset[int] = None,
@@ -311,13 +648,19 @@ class DFA:
                  transitions: dict[(int, str), int] = None,
                  start_state: int = None,
                  end_states: frozenset[int] = None,
-                 sink_state: int | None = None):
+                 sink_state: int | None = None,
+                 classes: 'CharClasses | None' = None):
         self.states = states if states is not None else frozenset()
         self.alphabet = alphabet if alphabet is not None else frozenset()
         self.transitions = transitions.copy() if transitions is not None else dict()
         self.start_state = start_state
         self.end_states = end_states if states is not None else frozenset()
         self.sink_state = sink_state
+        self.classes = classes
+        self.table: array | None = None
+        self.accepting: bytes | None = None
+        self.dead_state = -1
+        self.minimization_rounds: int | None = None  # set by minimalize on the DFA it returns
 
     def __repr__(self):
         return f"{self.__class__.__name__}(\n    states={self.states},\n    alphabet={self.alphabet},\n    " \
@@ -325,11 +668,74 @@ class DFA:
                f"end_states={self.end_states}\n    sink_state={self.sink_state}\n)"
 
     def serialize(self) -> bytes:
-        return dumps(self)
+        """
+        Returns the table form of the DFA, see build_table, in a binary format read by unpack. All numbers
+        are little-endian:
+        - header: magic b"RXDF", format version (uint16), 0 (uint16), number of states, number of classes
+          (uint32), start state, dead state or -1 (int32), number of characters in the class map (uint32)
+        - the code points of those characters (uint32 each)
+        - the transition table (int32 each, indexed as state * classes + class ID)
+        - the class IDs of the characters of the class map (uint8 each, uint16 if there are over 256 classes)
+        - the accept bitmap, bit state % 8 of byte state // 8 is set for accepting states
+        """
+        if self.table is None:
+            raise ValueError("Only a DFA with a table can be serialized, see build_table.")
+        class_of = self.classes.class_of
+        codepoints = array('I', map(ord, class_of))
+        table = array('i', self.table)
+        class_ids = array('B' if len(self.classes) <= 256 else 'H', class_of.values())
+        if sys.byteorder != "little":
+            codepoints.byteswap()
+            table.byteswap()
+            class_ids.byteswap()
+        header = _DFA_HEADER.pack(_DFA_MAGIC, DFA_FORMAT_VERSION, 0, len(self.accepting), len(self.classes),
+                                  self.start_state, self.dead_state, len(class_of))
+        return b"".join([header, codepoints.tobytes(), table.tobytes(), class_ids.tobytes(),
+                         _to_bitmap(self.accepting)])
 
     @classmethod
-    def unpack(cls, contents: bytes) -> Self:
-        return loads(contents)
+    def unpack(cls, contents: bytes | memoryview | mmap, validate: bool = False) -> Self:
+        """
+        Reads a DFA written by serialize. Its table is a memoryview of contents, which is not copied,
+        and only the table form is restored: table, accepting, dead_state, start_state and classes.
+        Raises ValueError if contents is not a serialized DFA, or if its states or class IDs are out of range.
+        The targets in the table are checked only if validate is set, that reads the whole table.
+        """
+        view = memoryview(contents).cast('B')
+        if len(view) < _DFA_HEADER.size:
+            raise ValueError("Not a serialized DFA.")
+        magic, version, _, states, size, start, dead, characters = _DFA_HEADER.unpack_from(view)
+        if magic != _DFA_MAGIC:
+            raise ValueError("Not a serialized DFA.")
+        if version != DFA_FORMAT_VERSION:
+            raise ValueError(f"Unsupported DFA format version {version}.")
+        width = 1 if size <= 256 else 2
+        sections = [4 * characters, 4 * states * size, width * characters, (states + 7) // 8]
+        if len(view) != _DFA_HEADER.size + sum(sections):
+            raise ValueError("Serialized DFA has a wrong length.")
+        codepoints, table, class_ids, bitmap = _split(view, _DFA_HEADER.size, sections)
+        codepoints, table, class_ids = codepoints.cast('I'), table.cast('i'), class_ids.cast('BH'[width - 1])
+        if sys.byteorder != "little":
+            codepoints, table = array('I', codepoints), array('i', table)
+            codepoints.byteswap()
+            table.byteswap()
+            if width == 2:
+                class_ids = array('H', class_ids)
+                class_ids.byteswap()
+        # the states and class IDs index the table and the accept bitmap, so they have to be in range
+        if not 0 <= start < states or not -1 <= dead < states:
+            raise ValueError("Serialized DFA has a start or dead state out of range.")
+        if validate and len(table) and (min(table) < 0 or max(table) >= states):
+            raise ValueError("Serialized DFA has a transition to a state out of range.")
+        if characters and max(class_ids) >= size:
+            raise ValueError("Serialized DFA has a class ID out of range.")
+        dfa = cls(alphabet=frozenset(range(size)), start_state=start,
+                  sink_state=dead if dead >= 0 else None,
+                  classes=CharClasses(dict(zip(map(chr, codepoints), class_ids))))
+        dfa.table = table
+        dfa.accepting = _from_bitmap(bitmap, states)
+        dfa.dead_state = dead
+        return dfa
 
     def detect_sinkhole(self) -> bool:
         for state in self.states.difference(self.end_states):
@@ -338,6 +744,46 @@ class DFA:
                 return True
         return False
 
+    def build_table(self) -> None:
+        """
+        Lays the transitions out in a flat array('i') indexed as state * len(classes) + class_id,
+        with accepting[state] set to 1 for end states and dead_state set to the sink state (-1 if none).
+        States have to be numbered 0..n-1 and the DFA has to read class IDs.
+        """
+        size = len(self.classes)
+        self.table = array('i', [self.transitions[(state, letter)]
+                                 for state in range(len(self.states)) for letter in range(size)])
+        self.accepting = bytes(state in self.end_states for state in range(len(self.states)))
+        self.dead_state = self.sink_state if self.sink_state is not None else -1
+
+    def to_enfa(self) -> ENFA:
+        """
+        Returns the DFA as an ENFA with the same state numbers and one more state, the end state,
+        reached by an epsilon transition from every end state. Transitions into the sink are left out.
+        """
+        if self.table is not None:
+            return self._table_to_enfa()
+        end_state = max(self.states) + 1
+        transitions: dict[(int, str | int), set[int]] = dict()
+        for (state, letter), target in self.transitions.items():
+            if target != self.sink_state:
+                transitions[(state, letter)] = {target}
+        for state in self.end_states:
+            transitions[(state, "")] = {end_state}
+        return ENFA(set(self.states) | {end_state}, transitions, self.start_state, end_state)
+
+    def _table_to_enfa(self) -> ENFA:
+        """to_enfa for a DFA in table form, which may have been unpacked without its transitions."""
+        size, states, dead = len(self.classes), len(self.accepting), self.dead_state
+        transitions: dict[(int, str | int), set[int]] = dict()
+        for state in range(states):
+            for letter, target in enumerate(self.table[state * size:(state + 1) * size]):
+                if target != dead:
+                    transitions[(state, letter)] = {target}
+            if self.accepting[state]:
+                transitions[(state, "")] = {states}
+        return ENFA(set(range(states + 1)), transitions, self.start_state, states)
+
     @classmethod
     def get_dfa(cls, nfa: NFA) -> Self:
         alphabet = nfa.get_alphabet()
@@ -378,6 +824,45 @@ class DFA:
             end_states=frozenset(end_states)
         )
 
+    @classmethod
+    def from_enfa(cls, enfa: ENFA, classes: 'CharClasses | None' = None, max_states: int | None = None) -> Self:
+        """
+        Determinizes enfa directly with the subset construction, starting from the closure of its
+        start state. Only the subsets reachable from it are built, so no NFA is materialised.
+
+        If enfa was compressed with classes, the DFA reads class IDs and every class is in its alphabet.
+        Raises StateLimitExceeded if more than max_states states would be built.
+        """
+        alphabet = enfa.get_alphabet() if classes is None else frozenset(range(len(classes)))
+        start = enfa.e_closure([enfa.start_state])
+        empty = frozenset()
+        determined_states: dict[frozenset[int], int] = {start: 0}
+        upcoming_states: list[frozenset[int]] = [start]
+        transitions: dict[(int, str), int] = dict()
+        end_states: set[int] = set()
+
+        for state_index, current_state in enumerate(upcoming_states):
+            if enfa.end_state in current_state:
+                end_states.add(state_index)
+            moves = enfa.moves(current_state)
+            for letter in alphabet:
+                after_transition = moves.get(letter, empty)
+                if after_transition not in determined_states:
+                    if max_states is not None and len(upcoming_states) >= max_states:
+                        raise StateLimitExceeded(max_states)
+                    determined_states[after_transition] = len(upcoming_states)
+                    upcoming_states.append(after_transition)
+                transitions[(state_index, letter)] = determined_states[after_transition]
+
+        return cls(
+            states=frozenset(range(len(upcoming_states))),
+            alphabet=alphabet,
+            transitions=transitions,
+            start_state=0,
+            end_states=frozenset(end_states),
+            classes=classes
+        )
+
     def _is_in_relation(self, abstract_classes: frozenset[frozenset[int]], a: int, b: int) -> bool:
         for letter in self.alphabet:
             subset = {self.transitions[(a, letter)], self.transitions[(b, letter)]}
@@ -416,9 +901,145 @@ class DFA:
 
         return frozenset(frozenset(s) for s in in_relation.values())
 
-    def minimalize(self) -> Self:
+    def minimalize(self, algorithm: str = "hopcroft") -> Self:
+        """
+        Returns the minimal DFA accepting the same language.
+
+        algorithm selects the minimizer: "hopcroft" (partition refinement, the default)
+        or "relations" (the original pairwise relation relaxing, kept for cross-checking).
+        minimization_rounds of the result counts the splitters Hopcroft's algorithm refined
+        the partition with, or the passes of relation relaxing.
+        """
+        if algorithm == "hopcroft":
+            return self._minimalize_hopcroft()
+        elif algorithm == "relations":
+            return self._minimalize_relations()
+        else:
+            raise ValueError("Invalid minimization algorithm: " + algorithm)
+
+    def _minimalize_hopcroft(self) -> Self:
+        states = sorted(self.states)
+        letters = sorted(self.alphabet)
+        state_to_index = {state: index for index, state in enumerate(states)}
+        size = len(states)
+
+        inverse: list[list[list[int]]] = [[[] for _ in range(size)] for _ in letters]
+        for a, letter in enumerate(letters):
+            inverse_letter = inverse[a]
+            for index, state in enumerate(states):
+                inverse_letter[state_to_index[self.transitions[(state, letter)]]].append(index)
+
+        # the partition is kept in one array, every block occupies elements[first[b]:end[b]]
+        # and its marked states are moved to the front, up to middle[b]
+        accepting = [i for i, state in enumerate(states) if state in self.end_states]
+        rejecting = [i for i, state in enumerate(states) if state not in self.end_states]
+        elements = accepting + rejecting
+        location = [0] * size
+        for position, index in enumerate(elements):
+            location[index] = position
+        block_of = [0] * size
+        first: list[int] = []
+        end: list[int] = []
+        for members in (accepting, rejecting):
+            if members:
+                for index in members:
+                    block_of[index] = len(first)
+                first.append(location[members[0]])
+                end.append(location[members[0]] + len(members))
+        middle = first.copy()
+
+        waiting = [min(range(len(first)), key=lambda b: end[b] - first[b])] if first else []
+        in_waiting = set(waiting)
+        rounds = 0
+
+        while waiting:
+            rounds += 1
+            splitter = waiting.pop()
+            in_waiting.discard(splitter)
+            splitter_states = elements[first[splitter]:end[splitter]]
+
+            for inverse_letter in inverse:
+                touched: list[int] = []
+                for target in splitter_states:
+                    for source in inverse_letter[target]:
+                        block = block_of[source]
+                        position, marked_end = location[source], middle[block]
+                        if position < marked_end:
+                            continue
+                        other = elements[marked_end]
+                        elements[marked_end], elements[position] = source, other
+                        location[source], location[other] = marked_end, position
+                        middle[block] += 1
+                        if marked_end == first[block]:
+                            touched.append(block)
+
+                for block in touched:
+                    if middle[block] == end[block]:
+                        middle[block] = first[block]
+                        continue
+
+                    new_block = len(first)
+                    if middle[block] - first[block] <= end[block] - middle[block]:
+                        first.append(first[block])
+                        end.append(middle[block])
+                        first[block] = middle[block]
+                    else:
+                        first.append(middle[block])
+                        end.append(end[block])
+                        end[block] = middle[block]
+                    middle[block] = first[block]
+                    middle.append(first[new_block])
+                    for position in range(first[new_block], end[new_block]):
+                        block_of[elements[position]] = new_block
+
+                    if block in in_waiting or end[new_block] - first[new_block] <= end[block] - first[block]:
+                        waiting.append(new_block)
+                        in_waiting.add(new_block)
+                    else:
+                        waiting.append(block)
+                        in_waiting.add(block)
+
+        minimal = self._quotient([block_of[state_to_index[state]] for state in states], states, letters)
+        minimal.minimization_rounds = rounds
+        return minimal
+
+    def _quotient(self, block_of: list[int], states: list[int], letters: list) -> Self:
+        """Merges states of the same block, numbering blocks in breadth-first order from the start state."""
+        state_to_index = {state: index for index, state in enumerate(states)}
+        representative: dict[int, int] = dict()
+        for state in states:
+            representative.setdefault(block_of[state_to_index[state]], state)
+
+        enumerated: dict[int, int] = {block_of[state_to_index[self.start_state]]: 0}
+        queue = [block_of[state_to_index[self.start_state]]]
+        transitions: dict[(int, str), int] = dict()
+        end_states: set[int] = set()
+
+        for block in queue:
+            state = representative[block]
+            if state in self.end_states:
+                end_states.add(enumerated[block])
+            for letter in letters:
+                next_block = block_of[state_to_index[self.transitions[(state, letter)]]]
+                if next_block not in enumerated:
+                    enumerated[next_block] = len(enumerated)
+                    queue.append(next_block)
+                transitions[(enumerated[block], letter)] = enumerated[next_block]
+
+        return self.__class__(
+            states=frozenset(range(len(enumerated))),
+            alphabet=self.alphabet,
+            transitions=transitions,
+            start_state=0,
+            end_states=frozenset(end_states),
+            classes=self.classes
+        )
+
+    def _minimalize_relations(self) -> Self:
         abstract_classes = frozenset({self.states.difference(self.end_states), self.end_states})
+        rounds = 0
         while True:
+            rounds += 1
             upcoming = set()
             for element in abstract_classes:
                 upcoming.update(self._relax_relations(element, abstract_classes))
@@ -443,10 +1064,178 @@ class DFA:
             for letter in self.alphabet:
                 transitions[(enumerated[s], letter)] = enumerated[self.transitions[(s, letter)]]
 
-        return self.__class__(
+        minimal = self.__class__(
             states=frozenset(states),
             alphabet=self.alphabet,
             transitions=transitions,
             start_state=start_state,
-            end_states=frozenset(end_states)
+            end_states=frozenset(end_states),
+            classes=self.classes
         )
+        minimal.minimization_rounds = rounds
+        return minimal
+
+
+class LazyDFA:
+    """
+    DFA built on demand from an ENFA compressed with classes.
+
+    States are created only when the input reaches them and their transitions are kept in a
+    flat table laid out like DFA.table, with -1 for transitions not computed yet. The table
+    holds at most max_states states, when it is full it is flushed and rebuilt from scratch.
+    """
+
+    def __init__(self, enfa: ENFA, classes: CharClasses, max_states: int = 10000):
+        if max_states < 4:
+            raise ValueError("The lazy DFA needs room for at least 4 states.")
+        self.enfa = enfa
+        self.classes = classes
+        self.max_states = max_states
+        self.table = array('i')
+        self.accepting = bytearray()
+        self.lookups = 0
+        self.misses = 0
+        self.flushes = 0
+        self._subsets: list[frozenset[int]] = []
+        self._index: dict[frozenset[int], int] = dict()
+        self.start_state = self._add_state(self._start_subset())
+        self.dead_state = self._add_state(frozenset())
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(states={len(self._subsets)}, max_states={self.max_states}, " \
+               f"hit_rate={self.hit_rate:.3f}, flushes={self.flushes})"
+
+    def __len__(self) -> int:
+        return len(self._subsets)
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of transitions taken from the table instead of being computed."""
+        if self.lookups == 0:
+            return 0.0
+        return max(0.0, 1 - self.misses / self.lookups)
+
+    def subset(self, state: int) -> frozenset[int]:
+        return self._subsets[state]
+
+    def state_of(self, subset: frozenset[int]) -> int:
+        """Returns the ID of the state of subset, which is added if the table does not hold it."""
+        return self._add_state(subset)
+
+    def next_state(self, state: int, letter: int, flush: bool = True) -> int:
+        """
+        Computes the transition from state on letter and stores it in the table.
+
+        If the table is full and flush is set, it is flushed first: only the start, dead and
+        returned states survive, so callers must not hold other state IDs.
+        """
+        self.misses += 1
+        subset = self._subsets[state]
+        if flush and len(self._subsets) >= self.max_states:
+            self.flush()
+            state = self._add_state(subset)
+        target = self._move(subset, letter)
+        next_state = self._index.get(target)
+        if next_state is None:
+            next_state = self._add_state(target)
+        self.table[state * len(self.classes) + letter] = next_state
+        return next_state
+
+    def flush(self) -> None:
+        """Forgets every state, the start and dead states keep their IDs."""
+        start, dead = self._subsets[self.start_state], self._subsets[self.dead_state]
+        del self.table[:]
+        del self.accepting[:]
+        self._subsets.clear()
+        self._index.clear()
+        self._add_state(start)
+        if dead != start:
+            self._add_state(dead)
+        self.flushes += 1
+
+    def _add_state(self, subset: frozenset[int]) -> int:
+        if subset in self._index:
+            return self._index[subset]
+        state = len(self._subsets)
+        self._subsets.append(subset)
+        self._index[subset] = state
+        self.table.extend([state if self._is_absorbing(subset) else -1] * len(self.classes))
+        self.accepting.append(self._is_accepting(subset))
+        return state
+
+    def _start_subset(self) -> frozenset[int]:
+        return self.enfa.e_closure([self.enfa.start_state])
+
+    def _move(self, subset: frozenset[int], letter: int) -> frozenset[int]:
+        return self.enfa.move(subset, letter)
+
+    def _is_accepting(self, subset: frozenset[int]) -> bool:
+        return self.enfa.end_state in subset
+
+    def _is_absorbing(self, subset: frozenset[int]) -> bool:
+        """States that only lead to themselves get their whole row filled when they are created."""
+        return not subset
+
+
+class UnanchoredDFA(LazyDFA):
+    """
+    Lazy DFA of the threads of enfa started at every position before the current one.
+
+    A new thread starts in front of every letter, so after a text the state holds the threads of
+    all its suffixes that are still alive. The start state is the empty subset: it means that no
+    thread is alive, so no match can span that position. A state is accepting when a thread has
+    just reached the end state, which is a match that ends there and starts earlier.
+    Run on enfa.reverse() over the reversed text it tells at which positions matches start.
+    """
+
+    def __init__(self, enfa: ENFA, classes: CharClasses, max_states: int = 10000):
+        self._initial = enfa.e_closure([enfa.start_state])
+        super().__init__(enfa, classes, max_states)
+
+    def _start_subset(self) -> frozenset[int]:
+        return frozenset()
+
+    def _move(self, subset: frozenset[int], letter: int) -> frozenset[int]:
+        return self.enfa.move(subset | self._initial, letter)
+
+    def _is_absorbing(self, subset: frozenset[int]) -> bool:
+        return False
+
+
+class LabelledDFA(LazyDFA):
+    """
+    Lazy DFA of automata joined by ENFA.join, labels[state] holds the indices of the joined automata
+    whose end state is in state. Unanchored, it starts a thread of each of them in front of every
+    letter like UnanchoredDFA, so a label then tells which automata match a text ending there.
+    """
+
+    def __init__(self, enfa: ENFA, ends: list[int], classes: CharClasses, max_states: int = 10000,
+                 anchored: bool = True):
+        self.labels: list[frozenset[int]] = []
+        self.anchored = anchored
+        self._label_of = {end: index for index, end in enumerate(ends)}
+        self._ends = frozenset(ends)
+        self._initial = enfa.e_closure([enfa.start_state])
+        super().__init__(enfa, classes, max_states)
+
+    def flush(self) -> None:
+        self.labels.clear()
+        super().flush()
+
+    def _add_state(self, subset: frozenset[int]) -> int:
+        state = super()._add_state(subset)
+        if state == len(self.labels):
+            self.labels.append(frozenset(map(self._label_of.get, subset & self._ends)))
+        return state
+
+    def _start_subset(self) -> frozenset[int]:
+        return self._initial if self.anchored else frozenset()
+
+    def _move(self, subset: frozenset[int], letter: int) -> frozenset[int]:
+        return self.enfa.move(subset if self.anchored else subset | self._initial, letter)
+
+    def _is_accepting(self, subset: frozenset[int]) -> bool:
+        return not self._ends.isdisjoint(subset)
+
+    def _is_absorbing(self, subset: frozenset[int]) -> bool:
+        return self.anchored and not subset
@@ -0,0 +1,172 @@
+"""Process-wide cache of compiled regular expressions"""
+
+from collections import OrderedDict
+from threading import Lock, Event
+from typing import NamedTuple, Iterator
+from .compiled import CompiledRegex, Match
+
+
+class CacheInfo(NamedTuple):
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+
+
+class _Pending:
+    """Compilation in progress, threads asking for the same pattern wait for it"""
+
+    def __init__(self):
+        self.done = Event()
+        self.result: CompiledRegex | None = None
+        self.error: BaseException | None = None
+
+
+class PatternCache:
+    """
+    Bounded LRU cache of CompiledRegex objects shared by all threads.
+
+    At most max_entries patterns are kept and, if max_size is given, their automata hold at most
+    max_size transitions in total, each entry counted with the most its lazy automata can grow to,
+    see entry_size. Concurrent requests for a pattern that is being compiled wait for that single
+    compilation instead of starting their own.
+    """
+
+    def __init__(self, max_entries: int = 512, max_size: int | None = None):
+        if max_entries < 1:
+            raise ValueError("The cache has to hold at least one entry.")
+        self.max_entries = max_entries
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.size = 0
+        self._entries: OrderedDict[tuple, (CompiledRegex, int)] = OrderedDict()
+        self._pending: dict[tuple, _Pending] = dict()
+        self._lock = Lock()
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(max_entries={self.max_entries}, max_size={self.max_size})"
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, pattern: str, **flags) -> CompiledRegex:
+        """Returns the compiled pattern, compiling it only if it is not cached yet."""
+        key = (pattern, tuple(sorted(flags.items())))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = self._pending[key] = _Pending()
+                self.misses += 1
+                owner = True
+            else:
+                self.hits += 1
+                owner = False
+
+        if not owner:
+            pending.done.wait()
+            if pending.error is not None:
+                raise pending.error
+            return pending.result
+
+        try:
+            compiled = CompiledRegex(pattern, **flags)
+        except BaseException as error:
+            pending.error = error
+            with self._lock:
+                del self._pending[key]
+            pending.done.set()
+            raise
+
+        pending.result = compiled
+        with self._lock:
+            del self._pending[key]
+            self._insert(key, compiled)
+        pending.done.set()
+        return compiled
+
+    def clear(self) -> None:
+        """Removes every entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.size = self.hits = self.misses = self.evictions = 0
+
+    def info(self) -> CacheInfo:
+        with self._lock:
+            return CacheInfo(self.hits, self.misses, self.evictions, len(self._entries), self.size)
+
+    @staticmethod
+    def entry_size(compiled: CompiledRegex) -> int:
+        """
+        Returns the most transitions the automata of compiled can hold: the table of the DFA and the
+        unanchored pair that search builds on it, or the three lazy automata of the lazy engine. A lazy
+        automaton holds at most lazy_max_states states, and one built on a DFA of n states at most 2 ** (n + 1),
+        the subsets of the states of its ENFA.
+        """
+        classes, max_states = len(compiled.dfa.classes), compiled._lazy_max_states
+        if compiled.engine == "lazy":
+            return 3 * max_states * classes
+        states = len(compiled.dfa.accepting)
+        return len(compiled.dfa.table) + 2 * min(max_states, 2 ** min(states + 1, 64)) * classes
+
+    def _insert(self, key: tuple, compiled: CompiledRegex) -> None:
+        size = self.entry_size(compiled)
+        self._entries[key] = (compiled, size)
+        self.size += size
+        while len(self._entries) > self.max_entries or \
+                (self.max_size is not None and self.size > self.max_size and len(self._entries) > 0):
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.size -= evicted_size
+            self.evictions += 1
+
+
+default_cache = PatternCache()
+
+
+def compile(pattern: str, **flags) -> CompiledRegex:
+    """Returns the compiled pattern from the process-wide cache."""
+    return default_cache.get(pattern, **flags)
+
+
+def full_match(pattern: str, text: str, **flags) -> Match | None:
+    return compile(pattern, **flags).full_match(text)
+
+
+def match(pattern: str, text: str, **flags) -> Match | None:
+    return compile(pattern, **flags).match(text)
+
+
+def search(pattern: str, text: str, **flags) -> Match | None:
+    return compile(pattern, **flags).search(text)
+
+
+def find_all(pattern: str, text: str, **flags) -> list[Match]:
+    return compile(pattern, **flags).find_all(text)
+
+
+def finditer(pattern: str, text: str, **flags) -> Iterator[Match]:
+    return compile(pattern, **flags).finditer(text)
+
+
+def is_match(pattern: str, text: str, **flags) -> bool:
+    return compile(pattern, **flags).is_match(text)
+
+
+def count(pattern: str, text: str, **flags) -> int:
+    return compile(pattern, **flags).count(text)
+
+
+def purge() -> None:
+    """Empties the process-wide cache."""
+    default_cache.clear()
+
+
+def cache_info() -> CacheInfo:
+    return default_cache.info()
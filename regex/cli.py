@@ -0,0 +1,133 @@
+"""Command-line search of files, run as python -m regex"""
+
+import sys
+from argparse import ArgumentParser
+from mmap import mmap, ACCESS_READ
+from os import walk, fstat, fsencode, cpu_count
+from os.path import isdir, join
+from time import perf_counter
+from typing import Iterator
+from . import compiled
+from .cache import compile
+from .compiled import CompiledRegex
+from .disk_cache import set_cache_dir
+
+
+def walk_files(paths: list[str]) -> Iterator[str]:
+    """Yields the files among paths and the files in the directories among them, recursively."""
+    for path in paths:
+        if not isdir(path):
+            yield path
+            continue
+        for directory, subdirectories, files in walk(path):
+            subdirectories.sort()
+            for name in sorted(files):
+                yield join(directory, name)
+
+
+def grep_file(regex: CompiledRegex, path: str, mode: str) -> tuple[bytes, int, int, str | None]:
+    """
+    Searches the memory-mapped bytes of a file for regex and returns its output, the number of matches, its size
+    and the error met reading it, if any. mode "lines" prints path:line:column:match for every match,
+    "count" prints path:count and "files" prints the path if anything matches.
+    """
+    name = fsencode(path)
+    try:
+        with open(path, "rb") as file:
+            size = fstat(file.fileno()).st_size
+            if size == 0:
+                return name + b":0\n" if mode == "count" else b"", 0, 0, None
+            with mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+                out = []
+                count, line, line_begin, position = 0, 1, 0, 0
+                for begin, end in regex.scan(data):
+                    count += 1
+                    if mode == "files":
+                        break
+                    if mode == "count":
+                        continue
+                    skipped = data[position:begin]
+                    newline = skipped.rfind(b"\n")
+                    if newline >= 0:
+                        line += skipped.count(b"\n")
+                        line_begin = position + newline + 1
+                    position = begin
+                    out.append(b"%s:%d:%d:%s\n" % (name, line, begin - line_begin + 1, data[begin:end]))
+    except OSError as error:
+        return b"", 0, 0, f"{path}: {error.strerror}"
+    if mode == "count":
+        return b"%s:%d\n" % (name, count), count, size, None
+    if mode == "files":
+        return name + b"\n" if count else b"", count, size, None
+    return b"".join(out), count, size, None
+
+
+def _grep_in_worker(path: str, mode: str) -> tuple[bytes, int, int, str | None]:
+    """Runs grep_file in a process of the pool, for the regex unpacked by its initializer."""
+    return grep_file(compiled._worker_regex, path, mode)
+
+
+def main(argv: list[str] | None = None) -> int:
+    """Runs the command line, returns the exit status: 0 if anything matched, 1 if not, 2 on errors."""
+    parser = ArgumentParser(prog="python -m regex", description="Prints the matches of a regular expression "
+                                                                "in files, as path:line:column:match.")
+    parser.add_argument("pattern", help="regular expression")
+    parser.add_argument("paths", nargs="*", default=["."], help="files and directories searched recursively")
+    modes = parser.add_mutually_exclusive_group()
+    modes.add_argument("-c", "--count", action="store_const", const="count", dest="mode", default="lines",
+                       help="print only the number of matches in each file")
+    modes.add_argument("-l", "--files-with-matches", action="store_const", const="files", dest="mode",
+                       help="print only the paths of the files with matches")
+    parser.add_argument("-j", "--jobs", type=int, default=cpu_count() or 1,
+                        help="number of worker processes (default: number of CPUs)")
+    parser.add_argument("--stats", action="store_true",
+                        help="print the time of each compilation stage and the throughput to stderr")
+    parser.add_argument("--cache-dir", help="directory of the disk cache of compiled patterns")
+    args = parser.parse_args(argv)
+
+    started = perf_counter()
+    if args.cache_dir is not None:
+        set_cache_dir(args.cache_dir)
+    try:
+        regex = compile(args.pattern)
+    except Exception as error:
+        print(f"regex: invalid pattern: {error}", file=sys.stderr)
+        return 2
+    files = list(walk_files(args.paths))
+    if args.jobs > 1 and len(files) > 1:
+        from concurrent.futures import ProcessPoolExecutor  # slow to import, a single file does not need it
+
+        pool = ProcessPoolExecutor(min(args.jobs, len(files)), initializer=compiled._init_worker,
+                                   initargs=(regex.pack(),))
+        results = pool.map(_grep_in_worker, files, [args.mode] * len(files), chunksize=8)
+    else:
+        pool = None
+        results = map(grep_file, [regex] * len(files), files, [args.mode] * len(files))
+
+    out = sys.stdout.buffer
+    matches = size = errors = 0
+    try:
+        for output, count, file_size, error in results:
+            if error is not None:
+                print(f"regex: {error}", file=sys.stderr)
+                errors += 1
+            out.write(output)
+            matches += count
+            size += file_size
+        out.flush()
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    if args.stats:
+        elapsed = perf_counter() - started
+        stages = ", ".join(f"{stage.name} {stage.seconds * 1000:.1f}"
+                           + (f" ({stage.states} states)" if stage.states is not None else "")
+                           for stage in regex.stats)
+        print(f"compiled in {sum(stage.seconds for stage in regex.stats) * 1000:.1f} ms: {stages} ms",
+              file=sys.stderr)
+        print(f"{len(files)} files, {size / 1e6:.1f} MB, {matches} matches in {elapsed:.3f} s, "
+              f"{size / 1e6 / elapsed:.1f} MB/s", file=sys.stderr)
+    if errors:
+        return 2
+    return 0 if matches else 1
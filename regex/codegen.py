@@ -0,0 +1,216 @@
+"""Generation of Python functions specialised for one DFA"""
+
+from typing import NamedTuple, Callable
+from .automata import DFA
+
+
+class GeneratedDFA(NamedTuple):
+    """
+    Functions generated for one DFA, they read the class IDs of a text, see CharClasses.encode
+
+    full_match(letters) tells whether letters reach an accepting state, match(letters, begin) returns the end
+    of the longest match starting at begin, -1 if there is none, and search(letters, begin) returns the span
+    of the leftmost-longest match starting at or after begin, None if there is none.
+    """
+    full_match: Callable[[bytes], bool]
+    match: Callable[[bytes, int], int]
+    search: Callable[[bytes, int], tuple[int, int] | None]
+    source: str
+
+
+def generate_source(dfa: DFA) -> str:
+    """
+    Returns the source of a module defining full_match, match and search for dfa, which needs a table.
+
+    Each state is a block of code testing the class ID with ==, a range or in on a frozenset. The block of
+    a state entered from a single other state is inlined where that one moves to it, so a chain of states
+    runs as straight code, and the other blocks are chosen by a binary search on the state number.
+    A self-loop skips every letter it reads at once, with find on the text translated to 0 for those letters
+    and 1 for the other ones, done once per call. search tries the positions a match can start at,
+    found the same way, and runs the automaton from each of them until it dies.
+    """
+    if dfa.table is None:
+        raise ValueError("Only a DFA with a table can be compiled to Python, see build_table.")
+    return _Generator(dfa).module()
+
+
+def compile_dfa(dfa: DFA) -> GeneratedDFA:
+    """Generates the functions of dfa, see generate_source."""
+    source = generate_source(dfa)
+    namespace = dict()
+    exec(compile(source, f"<regex dfa {id(dfa):#x}>", "exec"), namespace)
+    return GeneratedDFA(namespace["full_match"], namespace["match"], namespace["search"], source)
+
+
+class _Generator:
+
+    max_depth = 24  # levels of nested blocks, Python limits the indentation to 100
+
+    def __init__(self, dfa: DFA):
+        self.dfa = dfa
+        self.size = len(dfa.classes)
+        self.states = len(dfa.accepting)
+        self.constants: list[str] = []
+        self.names: dict[str, str] = dict()
+        # the classes leading from each state to each live state, self-loops first, then the biggest groups
+        self.groups: list[list[tuple[int, list[int]]]] = []
+        sources: list[set[int]] = [set() for _ in range(self.states)]
+        for state in range(self.states):
+            targets: dict[int, list[int]] = dict()
+            for letter in range(self.size):
+                target = dfa.table[state * self.size + letter]
+                if target != dfa.dead_state:
+                    targets.setdefault(target, []).append(letter)
+                    sources[target].add(state)
+            self.groups.append(sorted(targets.items(), key=lambda group: (group[0] != state, -len(group[1]))))
+        self.loops = [state for state in range(self.states) if state in sources[state]]
+        # a state entered from only one other state is inlined into its block, so chains run as straight code
+        self.inlined = [len(sources[state]) == 1 and state not in sources[state] and state != dfa.start_state
+                        for state in range(self.states)]
+        self.mode = ""
+        self.entries: list[int] = []
+
+    def module(self) -> str:
+        dfa = self.dfa
+        start = dfa.start_state
+        accepting = self.constant(repr(bytes(dfa.accepting)))
+        # every position is a start if the start state is accepting, the empty match is there
+        first = sorted(letter for target, letters in self.groups[start] for letter in letters)
+        can_start = self.marks(range(256) if dfa.accepting[start] else first, True)
+
+        lines = ["def full_match(letters):",
+                 "    n = len(letters)",
+                 "    i = 0",
+                 f"    state = {start}"]
+        lines += self.loop_variables(1)
+        lines += ["    while i < n:",
+                  "        c = letters[i]",
+                  "        i += 1"]
+        lines += self.dispatch("full", 2)
+        lines += [f"    return {accepting}[state] == 1",
+                  "",
+                  "",
+                  "def match(letters, i):",
+                  "    n = len(letters)",
+                  f"    last = {'i' if dfa.accepting[start] else '-1'}",
+                  f"    state = {start}"]
+        lines += self.loop_variables(1)
+        lines += ["    while i < n:",
+                  "        c = letters[i]",
+                  "        i += 1"]
+        lines += self.dispatch("match", 2)
+        lines += ["    return last",
+                  "",
+                  "",
+                  "def search(letters, begin):",
+                  "    n = len(letters)",
+                  f"    starts = letters.translate({can_start})"]
+        lines += self.loop_variables(1)
+        lines += ["    while True:",
+                  "        begin = starts.find(1, begin)",
+                  "        if begin < 0:",
+                  "            return None",
+                  "        i = begin",
+                  f"        last = {'i' if dfa.accepting[start] else '-1'}",
+                  f"        state = {start}",
+                  "        while i < n:",
+                  "            c = letters[i]",
+                  "            i += 1"]
+        lines += self.dispatch("search", 3)
+        lines += ["        if last >= 0:",
+                  "            return begin, last",
+                  "        begin += 1"]
+        return "\n".join(self.constants + ["", ""] + lines) + "\n"
+
+    def constant(self, value: str) -> str:
+        """Returns the name of a module constant with the value."""
+        if value not in self.names:
+            self.names[value] = f"_C{len(self.names)}"
+            self.constants.append(f"{self.names[value]} = {value}")
+        return self.names[value]
+
+    def marks(self, letters: list[int] | range, member: bool) -> str:
+        """Returns the name of a bytes.translate table sending letters to member and the other ones to not member."""
+        if isinstance(letters, range):
+            return self.constant(f"bytes([{int(member)}]) * 256")
+        return self.constant(f"bytes((c {'in' if member else 'not in'} {tuple(letters)!r}) for c in range(256))")
+
+    def loop_variables(self, depth: int) -> list[str]:
+        return ["    " * depth + f"stops{state} = None" for state in self.loops]
+
+    def dispatch(self, mode: str, depth: int) -> list[str]:
+        """
+        Returns the code running the block of the current state for the letter c. Only the states that the
+        code leaves the block of another one in, the entries, need one here, starting from the start state.
+        """
+        self.mode = mode
+        self.entries = [self.dfa.start_state]
+        blocks = dict()
+        for state in self.entries:  # grows while the blocks are generated
+            blocks[state] = self.block(state, 0)
+        return self.tree(sorted(blocks), blocks, depth)
+
+    def tree(self, states: list[int], blocks: dict[int, list[str]], depth: int) -> list[str]:
+        """Returns the code choosing the block of the state among states by a binary search."""
+        indent = "    " * depth
+        if len(states) == 1:
+            return [indent + line for line in blocks[states[0]]]
+        middle = len(states) // 2
+        return [f"{indent}if state < {states[middle]}:", *self.tree(states[:middle], blocks, depth + 1),
+                f"{indent}else:", *self.tree(states[middle:], blocks, depth + 1)]
+
+    def block(self, state: int, depth: int) -> list[str]:
+        """Returns the code reading one letter c, at position i - 1, in state."""
+        indent = "    " * depth
+        groups = self.groups[state]
+        total = sum(len(letters) for _, letters in groups)
+        # the letters of the other classes lead to the dead state
+        died = {"full": "return False", "match": "return last", "search": "break"}[self.mode]
+        if not groups:
+            return [f"{indent}{died}"]
+        if len(groups) == 1:
+            lines = [] if total == self.size else [f"{indent}if {self.test(groups[0][1], False)}:",
+                                                   f"{indent}    {died}"]
+            return lines + self.transition(state, groups[0][0], groups[0][1], depth)
+        lines = []
+        for index, (target, letters) in enumerate(groups):
+            if index == len(groups) - 1 and total == self.size:
+                lines.append(f"{indent}else:")
+            else:
+                lines.append(f"{indent}{'elif' if index else 'if'} {self.test(letters, True)}:")
+            lines += self.transition(state, target, letters, depth + 1)
+        if total == self.size:
+            return lines
+        return lines + [f"{indent}else:", f"{indent}    {died}"]
+
+    def transition(self, state: int, target: int, letters: list[int], depth: int) -> list[str]:
+        indent = "    " * depth
+        last = [f"{indent}last = i"] if self.mode != "full" and self.dfa.accepting[target] else []
+        if target == state:
+            return [f"{indent}if stops{state} is None:",
+                    f"{indent}    stops{state} = letters.translate({self.marks(letters, False)})",
+                    f"{indent}i = stops{state}.find(1, i)",
+                    f"{indent}if i < 0:",
+                    f"{indent}    i = n", *last]
+        if not self.inlined[target] or depth >= self.max_depth:
+            if target not in self.entries:
+                self.entries.append(target)
+            return [f"{indent}state = {target}", *last]
+        ended = {"full": f"return {bool(self.dfa.accepting[target])}", "match": "return last",
+                 "search": "break"}[self.mode]
+        return [*last,
+                f"{indent}if i == n:",
+                f"{indent}    {ended}",
+                f"{indent}c = letters[i]",
+                f"{indent}i += 1",
+                *self.block(target, depth)]
+
+    def test(self, letters: list[int], member: bool) -> str:
+        """Returns the test of whether c is among letters if member is set, or is not among them otherwise."""
+        if len(letters) == 1:
+            return f"c {'==' if member else '!='} {letters[0]}"
+        if letters[-1] - letters[0] == len(letters) - 1:
+            if member:
+                return f"{letters[0]} <= c <= {letters[-1]}"
+            return f"c < {letters[0]} or c > {letters[-1]}"
+        return f"c {'in' if member else 'not in'} {self.constant(f'frozenset({letters!r})')}"
@@ -0,0 +1,1086 @@
+"""Regex toolset"""
+
+import sys
+from typing import Self, Union, Any, Iterator, Iterable, Callable, NamedTuple
+from functools import cache, cached_property
+from array import array
+from itertools import chain
+from struct import Struct
+from mmap import mmap, ACCESS_READ
+from os import fstat, PathLike
+from time import perf_counter
+from threading import local
+from .automata import ENFA, DFA, CharClasses, LazyDFA, UnanchoredDFA, StateLimitExceeded, _split
+from .parser import parse
+from .codegen import GeneratedDFA, compile_dfa
+from .disk_cache import get_disk_cache
+
+PACK_FORMAT_VERSION = 1
+_PACKED_MAGIC = b"RXCR"
+_PACKED_HEADER = Struct("<4sHHIIIII")
+_PACKED_LAZY = 1
+_PACKED_FIRST_LETTERS = 2
+_PACKED_CODEGEN = 4
+
+
+@cache
+def _numpy():
+    """Imports numpy the first time the batch methods need it, returns None if it is not installed."""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+class Match:
+    """Stores one substring of a text that belongs to the language expressed in regex"""
+
+    __slots__ = ("text", "span", "_reg", "_offset")
+
+    def __init__(self, text: str, span: tuple[int, int], __reg: 'CompiledRegex' = None, offset: int = 0):
+        self.text = text
+        self.span = span
+        self._reg = __reg
+        self._offset = offset  # position of text[0] in the scanned text, Scanner keeps only a part of it
+
+    def __repr__(self):
+        return f"<Match: {repr(self.get_str)}, span: {self.span}>"
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, type(self)):
+            return False
+        return self.text == other.text and self.span == other.span
+
+    @property
+    def begin(self) -> int:
+        return self.span[0]
+
+    @property
+    def end(self) -> int:
+        return self.span[1]
+
+    @property
+    def regex(self) -> Union['CompiledRegex', None]:
+        return self._reg
+
+    @property
+    def get_str(self) -> str:
+        return self.text[self.begin - self._offset:self.end - self._offset]
+
+
+class CompileStage(NamedTuple):
+    """
+    One stage of compiling a regular expression, see CompiledRegex.stats
+
+    peak_memory is the most memory in bytes the stage had allocated at once, on top of the memory allocated
+    before it, measured only for a compilation given a trace while tracemalloc is tracing. Each stage then
+    resets the peak of tracemalloc, so a caller tracking its own peak has to read it before compiling.
+    states and transitions count the automaton the stage built, rounds the refinements done by the
+    minimization.
+    """
+    name: str
+    seconds: float
+    peak_memory: int | None = None
+    states: int | None = None
+    transitions: int | None = None
+    rounds: int | None = None
+
+
+class _ThreadAutomata(local):
+    """
+    The lazy automata of a CompiledRegex used by one thread: the DFA of the lazy engine and the unanchored
+    pair, see CompiledRegex._forward. Their tables grow and are flushed while texts are scanned, so threads
+    do not share them.
+    """
+
+    def __init__(self):
+        self.dfa: LazyDFA | None = None
+        self.forward: UnanchoredDFA | None = None
+        self.reverse: UnanchoredDFA | None = None
+        # whether a state of the DFA can reach a match end in front of a state of the reversed automaton,
+        # cached for the flushes of both counted in alive_flushes, see _segment_spans
+        self.alive: dict[(int, int), bool] = dict()
+        self.alive_flushes = (0, 0)
+
+
+class CompiledRegex:
+    """
+    Compile a regular expression
+
+    engine selects the automaton used for scanning: "dfa" builds the whole minimal DFA up front,
+    "lazy" builds DFA states only when the input reaches them, in a cache of at most
+    lazy_max_states states, and "auto" uses the DFA unless the subset construction needs more
+    than auto_state_limit states. If a disk cache is set with regex.set_cache_dir, the packed
+    regex is loaded from it instead of being compiled, and stored there after compiling.
+
+    With codegen set, full_match, match and search run Python functions generated for the DFA, see
+    regex.codegen, if the DFA engine is used and has at most codegen_state_limit states. search then
+    runs the DFA from every position a match can start at, so it suits short texts.
+
+    stats lists the stages of the compilation as CompileStage records: parse, skeleton, classes, enfa,
+    determinize, then lazy or minimize, sinkhole and table, then codegen and start letters, or only unpack
+    for a regex loaded from the disk cache. trace, if given, is called with each record as its stage ends.
+
+    A CompiledRegex can be used by several threads at once, for instance through regex.compile. The lazy
+    automata, which grow while texts are scanned, are built by each thread for itself, so each one
+    can hold up to lazy_max_states states per thread. dfa is the one of the calling thread.
+    """
+
+    auto_state_limit = 5000
+    codegen_state_limit = 256
+    scan_block_size = 1 << 20
+
+    def __init__(self, regular_expression: str, engine: str = "auto", lazy_max_states: int = 10000,
+                 codegen: bool = False, trace: Callable[[CompileStage], None] | None = None):
+        if engine not in ("auto", "dfa", "lazy"):
+            raise ValueError("Invalid engine: " + engine)
+        self.stats: list[CompileStage] = []
+        disk_cache = get_disk_cache() if engine != "lazy" else None
+        if disk_cache is not None:
+            key = disk_cache.key(regular_expression, engine, lazy_max_states, self.auto_state_limit,
+                                 codegen and self.codegen_state_limit)
+            contents = disk_cache.get(key)
+            if contents is not None:
+                # other processes write the entries, so their tables are checked in full
+                try:
+                    stats = self.stats
+                    self.__dict__.update(self._stage(trace, "unpack", self.unpack, contents, True).__dict__)
+                    self.stats = stats
+                    return
+                except ValueError:
+                    disk_cache.remove(key)
+                    self.stats = []
+        self.regex = regular_expression
+        parsed = self._stage(trace, "parse", parse, regular_expression)
+        skeleton = self._stage(trace, "skeleton", ENFA.get_skeleton, parsed)
+        classes = self._stage(trace, "classes", CharClasses.from_transitions, skeleton.transitions)
+        enfa = self._stage(trace, "enfa", ENFA.get_enfa, parsed, classes)
+
+        dfa = None
+        if engine != "lazy":
+            try:
+                dfa = self._stage(trace, "determinize", DFA.from_enfa, enfa, classes,
+                                  None if engine == "dfa" else self.auto_state_limit)
+            except StateLimitExceeded:
+                pass
+
+        self._automata = _ThreadAutomata()
+        if dfa is None:
+            self.engine = "lazy"
+            self._dfa = self._automata.dfa = self._stage(trace, "lazy", LazyDFA, enfa, classes, lazy_max_states)
+        else:
+            self.engine = "dfa"
+            dfa = self._stage(trace, "minimize", dfa.minimalize)
+            self._stage(trace, "sinkhole", dfa.detect_sinkhole)
+            self._stage(trace, "table", dfa.build_table)
+            self._dfa = dfa
+        self._generated = self._stage(trace, "codegen", self._generate) if codegen else None
+        self._lazy_max_states = lazy_max_states
+        self._prefix, self._first_letters = self._stage(trace, "start letters", self._start_letters)
+        # a literal found in every match, worth looking for only if it is longer than the prefix,
+        # the stretches around it are cut where letters.find finds class 0, so the letters have to be bytes
+        literal = parsed.get_required_literal()
+        self._literal = literal if len(literal) > len(self._prefix) and len(classes) <= 256 else ""
+        if disk_cache is not None:
+            disk_cache.put(key, self.pack())
+
+    def __repr__(self):
+        return f"compile.CompiledRegex({repr(self.regex)})"
+
+    def _stage(self, trace: Callable[[CompileStage], None] | None, name: str, function: Callable, *args) -> Any:
+        """Runs one stage of the compilation, records it in self.stats and passes the record to trace."""
+        tracemalloc = sys.modules.get("tracemalloc")  # not imported here, tracing is started by the caller
+        # reset_peak loses the peak of the caller, which only asked for it by passing a trace
+        tracing = trace is not None and tracemalloc is not None and tracemalloc.is_tracing()
+        if tracing:
+            allocated = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        result = None
+        begin = perf_counter()
+        try:
+            result = function(*args)
+            return result
+        finally:
+            seconds = perf_counter() - begin
+            peak_memory = tracemalloc.get_traced_memory()[1] - allocated if tracing else None
+            states = transitions = None
+            if isinstance(result, ENFA):
+                states, transitions = len(result.states), sum(map(len, result.transitions.values()))
+            elif isinstance(result, DFA):
+                states, transitions = len(result.states), len(result.transitions)
+            stage = CompileStage(name, seconds, peak_memory, states, transitions,
+                                 getattr(result, "minimization_rounds", None))
+            self.stats.append(stage)
+            if trace is not None:
+                trace(stage)
+
+    # search and find_all split the text where no thread of the unanchored automaton is alive
+    # and find the starts of the matches between those points with the reversed one,
+    # both are built on first use by each thread, from the table of the DFA for the eager engine
+
+    @property
+    def dfa(self) -> DFA | LazyDFA:
+        """The DFA of the pattern, for the lazy engine the one of the calling thread, built on its first use."""
+        if self.engine != "lazy":
+            return self._dfa
+        automata = self._automata
+        if automata.dfa is None:
+            automata.dfa = LazyDFA(self._dfa.enfa, self._dfa.classes, self._dfa.max_states)
+        return automata.dfa
+
+    @cached_property
+    def _enfa(self) -> ENFA:
+        return self._dfa.enfa if self.engine == "lazy" else self._dfa.to_enfa()
+
+    @cached_property
+    def _reversed_enfa(self) -> ENFA:
+        return self._enfa.reverse()
+
+    @property
+    def _forward(self) -> UnanchoredDFA:
+        automata = self._automata
+        if automata.forward is None:
+            automata.forward = UnanchoredDFA(self._enfa, self.dfa.classes, self._lazy_max_states)
+        return automata.forward
+
+    @property
+    def _reverse(self) -> UnanchoredDFA:
+        automata = self._automata
+        if automata.reverse is None:
+            automata.reverse = UnanchoredDFA(self._reversed_enfa, self.dfa.classes, self._lazy_max_states)
+        return automata.reverse
+
+    def full_match(self, text: str) -> Match | None:
+        """
+        Returns Match object if the entire text matches the regular expression,
+        returns None otherwise.
+        """
+        dfa = self.dfa
+        if self._generated is not None:
+            matched = self._generated.full_match(dfa.classes.encode(text))
+            return Match(text, (0, len(text)), self) if matched else None
+        table, size, dead = dfa.table, len(dfa.classes), dfa.dead_state
+        current_state = dfa.start_state
+        steps = 0
+        for steps, letter in enumerate(dfa.classes.encode(text), 1):
+            next_state = table[current_state * size + letter]
+            if next_state < 0:
+                next_state = dfa.next_state(current_state, letter)
+            current_state = next_state
+            if current_state == dead:
+                break
+        self._count_lookups(steps)
+        if dfa.accepting[current_state]:
+            return Match(text, (0, len(text)), self)
+        else:
+            return None
+
+    def match(self, text: str) -> Match | None:
+        """
+        Returns Match object if the beginning of text matches the regular expression,
+        returns None otherwise.
+        """
+        dfa = self.dfa
+        if self._generated is not None:
+            end = self._generated.match(dfa.classes.encode(text), 0)
+            return Match(text, (0, end), self) if end >= 0 else None
+        table, size, dead, accepting = dfa.table, len(dfa.classes), dfa.dead_state, dfa.accepting
+        current_state = dfa.start_state
+        last_end_state = -1 if accepting[current_state] else None
+        i = -1
+        for i, letter in enumerate(dfa.classes.encode(text)):
+            next_state = table[current_state * size + letter]
+            if next_state < 0:
+                next_state = dfa.next_state(current_state, letter)
+            current_state = next_state
+            if current_state == dead:
+                break
+            if accepting[current_state]:
+                last_end_state = i
+        self._count_lookups(i + 1)
+        return Match(text, (0, last_end_state + 1), self) if last_end_state is not None else None
+
+    def full_match_many(self, strings: Iterable[str]) -> Union['numpy.ndarray', list[bool]]:
+        """
+        Returns a numpy bool array telling for each of strings whether it matches the regular expression
+        entirely, like full_match. Without numpy, returns a list of bools computed by full_match.
+        """
+        if _numpy() is None:
+            return [self.full_match(string) is not None for string in strings]
+        return self._run_many(self.dfa, strings, anywhere=False)
+
+    def is_match_many(self, strings: Iterable[str]) -> Union['numpy.ndarray', list[bool]]:
+        """
+        Returns a numpy bool array telling for each of strings whether the regular expression matches
+        anywhere in it, like search. Without numpy, returns a list of bools computed by is_match.
+        """
+        np = _numpy()
+        if np is None:
+            return [self.is_match(string) for string in strings]
+        if self.dfa.accepting[self.dfa.start_state]:
+            return np.fromiter(map(len, strings), dtype=np.intp) > 0
+        return self._run_many(self._forward, strings, anywhere=True)
+
+    def search(self, text: str) -> Match | None:
+        """
+        Returns the first substring in text that matches the regular expression,
+        returns None if no such substring is found.
+        """
+        if self._generated is not None:
+            letters = self.dfa.classes.encode(text)
+            span = self._generated.search(letters, 0) if letters else None
+            return Match(text, span, self) if span is not None else None
+        return next(self.finditer(text), None)
+
+    def find_all(self, text: str, workers: int | None = None) -> list[Match]:
+        """
+        Returns a list of all substrings that match the regular expression.
+        With workers > 1 the text is split into chunks scanned by a pool of that many processes.
+        """
+        if workers is not None and workers > 1 and not self.dfa.accepting[self.dfa.start_state]:
+            return [Match(text, span, self) for span in self._parallel_spans(text, workers)]
+        return list(self.finditer(text))
+
+    def is_match(self, text: str | bytes | bytearray) -> bool:
+        """
+        Tells whether the regular expression matches anywhere in text, like search does, but stops at the
+        first position where any match ends instead of finding the leftmost-longest one.
+        """
+        letters = self.dfa.classes.encode(text)
+        if not letters:
+            return False
+        if self.dfa.accepting[self.dfa.start_state]:
+            return True
+        literal = self._literal
+        if literal and not isinstance(text, str):
+            try:
+                literal = literal.encode("latin-1")
+            except UnicodeEncodeError:
+                return False
+        if literal and text.find(literal) < 0:
+            return False
+
+        forward = self._forward
+        table, size, idle, accepting = forward.table, len(forward.classes), forward.start_state, forward.accepting
+        prefix, first_letters = self._prefix, self._first_letters
+        can_start = first_letters if first_letters is not None else b"\x01" * size
+        marks = letters.translate(first_letters) if first_letters is not None and not prefix else None
+        view = memoryview(letters)
+        i, end = 0, len(letters)
+        while i < end:
+            if prefix:
+                i = letters.find(prefix, i)
+            elif marks is not None:
+                i = marks.find(1, i)
+            if i < 0:
+                break
+            skipped = i
+            state = idle
+            for i, letter in enumerate(view[i:end], i):
+                if state == idle and i != skipped and (prefix or not can_start[letter]):
+                    break
+                next_state = table[state * size + letter]
+                if next_state < 0:
+                    next_state = forward.next_state(state, letter)
+                state = next_state
+                if accepting[state]:
+                    forward.lookups += i + 1 - skipped
+                    return True
+            else:
+                i = end
+            forward.lookups += i - skipped
+        return False
+
+    def count(self, text: str | bytes | bytearray) -> int:
+        """Returns the number of matches find_all would find, without building them."""
+        found = 0
+        for _ in self._spans(text):
+            found += 1
+        return found
+
+    def find_spans(self, data: str | bytes | bytearray | memoryview | mmap) -> array:
+        """
+        Returns the spans of the matches find_all would find as one flat array('q') of their begins and ends,
+        begin, end, begin, end and so on, without building a Match for any of them. Accepts the same data
+        as scan. numpy.frombuffer(spans, numpy.int64).reshape(-1, 2) views it as an (n, 2) array.
+        """
+        return array('q', chain.from_iterable(self.scan(data)))
+
+    def scan(self, data: str | bytes | bytearray | memoryview | mmap) -> Iterator[tuple[int, int]]:
+        """
+        Yields the spans of the matches in data, the same ones as find_all would find.
+
+        Bytes-like objects are read as latin-1 characters and never decoded into a str. Memory views
+        and memory-mapped files are scanned in blocks of scan_block_size bytes, so only one block
+        and the text of a pending match are copied at a time.
+        """
+        if isinstance(data, (str, bytes, bytearray)):
+            yield from self._spans(data)
+            return
+        view = memoryview(data)
+        scanner = self.scanner()
+        for begin in range(0, len(view), self.scan_block_size):
+            yield from scanner.feed_spans(view[begin:begin + self.scan_block_size])
+        yield from scanner.close_spans()
+
+    def scan_file(self, path: str | PathLike, workers: int | None = None) -> Iterator[tuple[int, int]]:
+        """
+        Yields the spans of the matches in the bytes of a file, which is memory-mapped, see scan.
+        With workers > 1 the file is split into chunks scanned by a pool of that many processes.
+        """
+        with open(path, "rb") as file:
+            if fstat(file.fileno()).st_size == 0:
+                return
+            with mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+                if workers is not None and workers > 1 and not self.dfa.accepting[self.dfa.start_state]:
+                    yield from self._parallel_spans(data, workers, path)
+                else:
+                    yield from self.scan(data)
+
+    def scanner(self, offset: int = 0) -> 'Scanner':
+        """Returns a Scanner finding the matches in a text fed to it in chunks, see Scanner."""
+        return Scanner(self, offset)
+
+    def finditer(self, text: str) -> Iterator[Match]:
+        """
+        Yields the substrings that match the regular expression, like find_all, each one as soon as
+        the scan has passed a position that no match can span. Only the stretch of text being scanned
+        is kept besides the scanner state, except for patterns matching the empty string.
+        """
+        for span in self._spans(text):
+            yield Match(text, span, self)
+
+    def _spans(self, text: str | bytes | bytearray) -> Iterator[tuple[int, int]]:
+        """
+        Yields the spans of the leftmost-longest non-overlapping matches in text, in O(len(text)).
+
+        Letters of class 0 are read by no transition, so no match contains them. If every match contains
+        a literal, only the stretches between such letters around its occurrences are scanned.
+        Patterns matching the empty string match everywhere, so the whole text is one stretch.
+        """
+        letters = self.dfa.classes.encode(text)
+        if not letters:
+            return
+        if self.dfa.accepting[self.dfa.start_state]:
+            yield from self._segment_spans(letters, 0, len(letters))
+            return
+
+        marks = None
+        if self._first_letters is not None and not self._prefix:
+            marks = letters.translate(self._first_letters)
+        if not self._literal:
+            yield from self._scan(letters, marks, 0, len(letters))
+            return
+        literal, position, end = self._literal, 0, len(letters)
+        if not isinstance(text, str):
+            try:
+                literal = literal.encode("latin-1")
+            except UnicodeEncodeError:
+                return
+        while position < end:
+            hit = text.find(literal, position)
+            if hit < 0:
+                break
+            begin = letters.rfind(0, position, hit) + 1 or position
+            position = letters.find(0, hit + len(literal))
+            if position < 0:
+                position = end
+            yield from self._scan(letters, marks, begin, position)
+
+    def _scan(self, letters: bytes, marks: bytes | None, begin: int, end: int) -> Iterator[tuple[int, int]]:
+        """
+        Yields the matches in letters[begin:end], no match may span begin or end.
+
+        The unanchored automaton finds the positions where no match can span, and the stretches
+        between them in which a match ends. Only those stretches are scanned again, see _segment_spans.
+        While no thread is alive, it skips to the next prefix or letter marked in marks.
+        """
+        forward = self._forward
+        table, size, idle, accepting = forward.table, len(forward.classes), forward.start_state, forward.accepting
+        prefix, first_letters = self._prefix, self._first_letters
+        can_start = first_letters if first_letters is not None else b"\x01" * size
+        view = memoryview(letters)
+        i = begin
+        begin = None
+        while i < end:
+            # no thread is alive in front of letters[i], skip to the next letter that can start a match
+            if prefix:
+                i = letters.find(prefix, i, end)
+            elif marks is not None:
+                i = marks.find(1, i, end)
+            if i < 0:
+                break
+            last_idle = skipped = i
+            state = idle
+            for i, letter in enumerate(view[i:end], i):
+                if state == idle and i != skipped:
+                    if prefix or not can_start[letter]:
+                        break
+                    last_idle = i
+                next_state = table[state * size + letter]
+                if next_state < 0:
+                    next_state = forward.next_state(state, letter)
+                state = next_state
+                if accepting[state]:
+                    if begin is None:
+                        begin = last_idle
+                elif state == idle and begin is not None:
+                    yield from self._segment_spans(letters, begin, i + 1)
+                    begin = None
+            else:
+                i = end
+            forward.lookups += i - skipped
+        if begin is not None:
+            yield from self._segment_spans(letters, begin, end)
+
+    def _segment_spans(self, letters: bytes, begin: int, end: int) -> list[tuple[int, int]]:
+        """
+        Returns the matches in letters[begin:end], no match may span begin or end.
+        They are returned at once, so that no state ID is held while the caller is suspended.
+
+        The reversed unanchored automaton is run from end to begin, its state at a position tells
+        whether a match starts there and which states of self.dfa can still reach a match end.
+        Each match is then followed forward from its start only up to its last end.
+
+        The reversed automaton is run over windows of positions few enough for it to hold their states
+        without flushing, and flushed in between if needed, so its cache stays bounded however long the
+        stretch is. Its subsets at the ends of the windows are kept to run it again over a window whose
+        states were flushed since.
+        """
+        dfa, reverse = self.dfa, self._reverse
+        raccepting = reverse.accepting
+        window = max(1, (reverse.max_states - 2) // 2)
+        count = (end - begin - 1) // window + 1
+        # starts[i] tells whether a match starts at begin + i
+        w_begin, w_end = begin, end
+        if count <= 1:
+            reverse_states = self._reverse_window(reverse, letters, begin, end, reverse.subset(reverse.start_state))
+            starts = bytes(map(raccepting.__getitem__, reverse_states))
+        else:
+            # ahead[w] is the subset at the end of window w and windows[w] its states,
+            # which are valid while the automaton has been flushed flushed[w] times
+            starts = bytearray(end - begin + 1)
+            ahead: list[frozenset[int]] = [frozenset()] * count
+            windows: list[array] = [array('i')] * count
+            flushed = [0] * count
+            subset = reverse.subset(reverse.start_state)
+            for w in range(count - 1, -1, -1):
+                w_begin, w_end = begin + w * window, min(begin + (w + 1) * window, end)
+                ahead[w] = subset
+                windows[w] = reverse_states = self._reverse_window(reverse, letters, w_begin, w_end, subset)
+                flushed[w] = reverse.flushes
+                starts[w_begin - begin:w_end - begin + 1] = bytes(map(raccepting.__getitem__, reverse_states))
+                subset = reverse.subset(reverse_states[0])
+        # the last window run is the first one, where the forward pass starts
+
+        size = len(dfa.classes)
+        table, dead, accepting, start_state = dfa.table, dfa.dead_state, dfa.accepting, dfa.start_state
+        empty = accepting[start_state]
+        alive = self._alive_pairs()
+        position = begin
+        steps = 0
+        spans = []
+        while position < end:
+            if not empty:
+                found = starts.find(1, position - begin)
+                if found < 0:
+                    break
+                position = begin + found
+            last = position if empty else -1
+            current_state = start_state
+            i = position
+            while i < end:
+                next_state = table[current_state * size + letters[i]]
+                if next_state < 0:
+                    next_state = dfa.next_state(current_state, letters[i])
+                    self._alive_pairs()
+                current_state = next_state
+                i += 1
+                if current_state == dead:
+                    break
+                if accepting[current_state]:
+                    last = i
+                if i > w_end or i < w_begin:
+                    w = min((i - begin) // window, count - 1)
+                    w_begin, w_end = begin + w * window, min(begin + (w + 1) * window, end)
+                    if flushed[w] != reverse.flushes:
+                        windows[w] = self._reverse_window(reverse, letters, w_begin, w_end, ahead[w])
+                        flushed[w] = reverse.flushes
+                        self._alive_pairs()
+                    reverse_states = windows[w]
+                key = (current_state, reverse_states[i - w_begin])
+                if key not in alive:
+                    alive[key] = self._can_continue(*key)
+                if not alive[key]:
+                    break
+            steps += i - position
+            spans.append((position, last))
+            position = last if last > position else position + 1
+        self._count_lookups(steps)
+        return spans
+
+    @staticmethod
+    def _reverse_window(reverse: UnanchoredDFA, letters: bytes, begin: int, end: int, ahead: frozenset[int]) \
+            -> array:
+        """
+        Returns the states of the reversed unanchored automaton at the positions begin to end of letters,
+        end included, when its subset at end is ahead. It is flushed first if it could not hold them all.
+        """
+        if len(reverse.accepting) + end - begin + 1 > reverse.max_states:
+            reverse.flush()
+        size, rtable = reverse.classes.size, reverse.table
+        state = reverse.state_of(ahead)
+        states = array('i', [state]) * (end - begin + 1)
+        for i in range(end - 1, begin - 1, -1):
+            letter = letters[i]
+            next_state = rtable[state * size + letter]
+            if next_state < 0:
+                next_state = reverse.next_state(state, letter, flush=False)
+            state = next_state
+            states[i - begin] = state
+        reverse.lookups += end - begin
+        return states
+
+    def _can_continue(self, state: int, reverse_state: int) -> bool:
+        """Tells whether a thread in state of self.dfa can reach the end state again after the position
+        where the reversed automaton is in reverse_state."""
+        ahead = self._reverse.subset(reverse_state)
+        if self.engine == "lazy":
+            return not self.dfa.subset(state).isdisjoint(ahead)
+        return state in ahead
+
+    def _parallel_spans(self, data: str | mmap, workers: int, path: str | PathLike | None = None) \
+            -> list[tuple[int, int]]:
+        """
+        Returns the spans of the matches in data, found by a pool of workers processes scanning one chunk each.
+        The workers read the chunks of the file at path if it is given, data has to be its memory map then.
+
+        The effect of a chunk on the unanchored automaton depends on the threads alive in front of it, so each
+        chunk is scanned as if none were. Going through the chunks in order, the threads really alive are
+        followed to the first position where none is, from there on the speculative scan is exact. The matches
+        in front of that position are found by a Scanner fed the text in between, which then takes over the
+        state the chunk was left in. Patterns matching the empty string need no threads to match, so the
+        whole text is one stretch for them and they are scanned sequentially.
+        """
+        bounds = [len(data) * k // workers for k in range(workers + 1)]
+        chunks = list(zip(bounds, bounds[1:]))
+        from concurrent.futures import ProcessPoolExecutor  # costs more to import than the rest of the package
+
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(self.pack(),)) as pool:
+            if path is None:
+                futures = [pool.submit(_scan_chunk, data[begin:end], begin) for begin, end in chunks]
+            else:
+                futures = [pool.submit(_scan_file_chunk, path, begin, end) for begin, end in chunks]
+            scanner = self.scanner()
+            spans = []
+            for (begin, end), future in zip(chunks, futures):
+                chunk_spans, state = future.result()
+                synced = self._first_idle(scanner.state()[0], data, begin, end)
+                if synced > begin:
+                    spans += scanner.feed_spans(data[begin:synced])
+                if synced < end:
+                    spans += [span for span in chunk_spans if span[0] >= synced]
+                    scanner.resume(data, end, state)
+            return spans + scanner.close_spans()
+
+    def _first_idle(self, threads: frozenset[int], data: str | bytes | mmap, begin: int, end: int) -> int:
+        """
+        Returns the first position in data[begin:end] in front of which no thread is alive, when threads
+        are alive in front of begin, end if there is no such position.
+        """
+        if not threads:
+            return begin
+        forward = self._forward
+        table, size, idle = forward.table, len(forward.classes), forward.start_state
+        state = forward.state_of(threads)
+        position, block = begin, 256
+        while position < end:
+            letters = forward.classes.encode(data[position:min(end, position + block)])
+            for i, letter in enumerate(letters, position + 1):
+                next_state = table[state * size + letter]
+                if next_state < 0:
+                    next_state = forward.next_state(state, letter)
+                state = next_state
+                if state == idle:
+                    forward.lookups += i - begin
+                    return i
+            position += len(letters)
+            block *= 2
+        forward.lookups += end - begin
+        return end
+
+    def _start_letters(self) -> tuple[bytes, bytes | None]:
+        """
+        Reads from the start state of self.dfa the letters every match begins with and a bytes.translate
+        table sending the letters a match can begin with to 1 and the other ones to 0,
+        None if a match can begin with any letter. Neither is used if the letters do not fit in a byte.
+        """
+        dfa = self.dfa
+        size, dead = len(dfa.classes), dfa.dead_state
+        if size > 256:
+            return b"", None
+
+        def targets(state: int) -> list[(int, int)]:
+            out = []
+            for letter in range(size):
+                next_state = dfa.table[state * size + letter]
+                if next_state < 0:
+                    next_state = dfa.next_state(state, letter, flush=False)
+                if next_state != dead:
+                    out.append((letter, next_state))
+            return out
+
+        first = [letter for letter, _ in targets(dfa.start_state)]
+        first_letters = None if len(first) == size else bytes(letter in first for letter in range(256))
+        prefix = bytearray()
+        state = dfa.start_state
+        while not dfa.accepting[state] and len(prefix) < 256:
+            following = targets(state)
+            if len(following) != 1:
+                break
+            letter, state = following[0]
+            prefix.append(letter)
+        if isinstance(dfa, LazyDFA) and len(dfa) > dfa.max_states:
+            dfa.flush()  # the states were read without flushing, so they may not fit
+        return bytes(prefix), first_letters
+
+    def _generate(self) -> GeneratedDFA | None:
+        """
+        Returns the functions generated for the DFA, None for the lazy engine or a DFA too big for them.
+        They translate the letters with bytes.translate, so they cannot read more than 256 classes.
+        """
+        if self.engine == "lazy" or len(self.dfa.accepting) > self.codegen_state_limit \
+                or len(self.dfa.classes) > 256:
+            return None
+        return compile_dfa(self.dfa)
+
+    def _run_many(self, automaton: DFA | LazyDFA, strings: Iterable[str], anywhere: bool) -> 'numpy.ndarray':
+        """
+        Runs automaton over all strings at once and returns which of them end in an accepting state,
+        or pass one if anywhere is set.
+
+        The strings are encoded together into a 2-D array of class IDs, one row per string, with rows
+        sorted by decreasing length, so that the strings still being read in column j are the first
+        ones. Each column advances them all with one numpy lookup into the transition table.
+        Transitions missing from a lazy automaton are computed in between. A full one is flushed before
+        a column, keeping only the states the strings are in, so it grows at most by the states of a column.
+        """
+        np = _numpy()
+        strings = list(strings)
+        lengths = np.fromiter(map(len, strings), dtype=np.intp, count=len(strings))
+        width = int(lengths.max()) if len(strings) else 0
+        dtype = np.uint8 if len(automaton.classes) <= 256 else np.uint16  # see CharClasses.encode
+        letters = np.zeros((len(strings), width), dtype=dtype)
+        letters[np.arange(width) < lengths[:, None]] = np.frombuffer(
+            automaton.classes.encode("".join(strings)), dtype=dtype)
+        order = np.argsort(-lengths, kind="stable")
+        letters, lengths = letters[order], lengths[order]
+        # the number of strings longer than j, for each column j
+        active = np.searchsorted(-lengths, -np.arange(width), side="left")
+
+        size = len(automaton.classes)
+        table = np.array(automaton.table, dtype=np.int32)
+        accepting = np.frombuffer(bytes(automaton.accepting), dtype=np.bool_)
+        states = np.full(len(strings), automaton.start_state, dtype=np.int32)
+        passed = np.zeros(len(strings), dtype=np.bool_)
+        for column, count in enumerate(active):
+            if isinstance(automaton, LazyDFA) and len(automaton) >= automaton.max_states:
+                held, states = np.unique(states, return_inverse=True)
+                subsets = [automaton.subset(state) for state in held.tolist()]
+                automaton.flush()
+                held = np.array([automaton.state_of(subset) for subset in subsets], dtype=np.int32)
+                states = held[states.reshape(-1)]
+                table = np.array(automaton.table, dtype=np.int32)
+                accepting = np.frombuffer(bytes(automaton.accepting), dtype=np.bool_)
+            index = states[:count] * size + letters[:count, column]
+            targets = table[index]
+            missing = targets < 0
+            if missing.any():
+                for key in np.unique(index[missing]).tolist():
+                    automaton.next_state(key // size, key % size, flush=False)
+                table = np.array(automaton.table, dtype=np.int32)
+                accepting = np.frombuffer(bytes(automaton.accepting), dtype=np.bool_)
+                targets = table[index]
+            states[:count] = targets
+            if anywhere:
+                passed[:count] |= accepting[targets]
+        if isinstance(automaton, LazyDFA):
+            automaton.lookups += int(lengths.sum())
+        if not anywhere:
+            passed = accepting[states]
+        out = np.empty(len(strings), dtype=np.bool_)
+        out[order] = passed
+        return out
+
+    def _count_lookups(self, steps: int) -> None:
+        if self.engine == "lazy":
+            self.dfa.lookups += steps
+
+    def _alive_pairs(self) -> dict[(int, int), bool]:
+        """
+        Returns the cached pairs of state IDs of self.dfa and of the reversed automaton telling whether a match
+        end is reachable, emptied if any of them was flushed since they were cached, see _segment_spans.
+        """
+        automata = self._automata
+        flushes = (self.dfa.flushes if self.engine == "lazy" else 0, self._reverse.flushes)
+        if flushes != automata.alive_flushes:
+            automata.alive.clear()
+            automata.alive_flushes = flushes
+        return automata.alive
+
+    def pack(self) -> bytes:
+        """
+        Returns a serialised version of Self that can be stored in a file, in a binary format read by unpack.
+        All numbers are little-endian:
+        - header: magic b"RXCR", format version (uint16), flags (uint16, 1 for the lazy engine, 2 if there are
+          first letters, 4 if the DFA is run by generated functions), lazy_max_states, lengths of the
+          serialised DFA, of the pattern and of the required literal in UTF-8 and of the prefix (uint32)
+        - the DFA in the format of DFA.serialize, left out for the lazy engine
+        - the 256 bytes of the first letters table if there is one, the prefix, the pattern, the literal
+        A lazy engine is built while scanning, so only its pattern is stored and unpack compiles it again.
+        Generated functions are not stored, unpack generates them again.
+        """
+        lazy = self.engine == "lazy"
+        dfa = b"" if lazy else self.dfa.serialize()
+        pattern, literal = self.regex.encode(), self._literal.encode()
+        flags = _PACKED_LAZY * lazy | _PACKED_FIRST_LETTERS * (self._first_letters is not None) \
+            | _PACKED_CODEGEN * (self._generated is not None)
+        header = _PACKED_HEADER.pack(_PACKED_MAGIC, PACK_FORMAT_VERSION, flags, self._lazy_max_states,
+                                     len(dfa), len(pattern), len(literal), len(self._prefix))
+        return b"".join([header, dfa, self._first_letters or b"", self._prefix, pattern, literal])
+
+    @classmethod
+    def unpack(cls, contents: bytes | memoryview | mmap, validate: bool = False) -> Self:
+        """
+        Returns an instance of class serialised by self.pack(). The transition table is a memoryview
+        of contents and is not copied, so contents has to stay unchanged while the instance is used.
+        Raises ValueError if contents is not a packed regex. With validate set, the targets of the
+        transition table are checked as well, see DFA.unpack, which takes time linear in its size.
+        """
+        view = memoryview(contents).cast('B')
+        if len(view) < _PACKED_HEADER.size or view[:4] != _PACKED_MAGIC:
+            raise ValueError("Not a packed regex.")
+        _, version, flags, lazy_max_states, *lengths = _PACKED_HEADER.unpack_from(view)
+        if version != PACK_FORMAT_VERSION:
+            raise ValueError(f"Unsupported regex format version {version}.")
+        dfa_length, pattern_length, literal_length, prefix_length = lengths
+        first_length = 256 if flags & _PACKED_FIRST_LETTERS else 0
+        sections = [dfa_length, first_length, prefix_length, pattern_length, literal_length]
+        if len(view) != _PACKED_HEADER.size + sum(sections):
+            raise ValueError("Packed regex has a wrong length.")
+        dfa, first_letters, prefix, pattern, literal = _split(view, _PACKED_HEADER.size, sections)
+        pattern = str(pattern, "utf-8")
+        if flags & _PACKED_LAZY:
+            return cls(pattern, engine="lazy", lazy_max_states=lazy_max_states)
+        regex = cls.__new__(cls)
+        regex.regex = pattern
+        regex.engine = "dfa"
+        regex._dfa = DFA.unpack(dfa, validate)
+        if prefix_length and max(prefix) >= len(regex.dfa.classes):
+            raise ValueError("Packed regex has a prefix class ID out of range.")
+        regex._lazy_max_states = lazy_max_states
+        regex._automata = _ThreadAutomata()
+        regex._prefix = bytes(prefix)
+        regex._first_letters = bytes(first_letters) if first_length else None
+        regex._literal = str(literal, "utf-8")
+        regex._generated = regex._generate() if flags & _PACKED_CODEGEN else None
+        regex.stats = []
+        return regex
+
+
+class Scanner:
+    """
+    Finds the matches of a compiled regular expression in a text that arrives in chunks.
+
+    feed(chunk) returns the matches that became final and close() the remaining ones, with spans
+    counted from the beginning of the whole text. Together they give the same spans as find_all on
+    the joined text. Only the text from the last position that no match can span is kept, and the
+    Match objects hold just their own substring. feed_spans and close_spans return only the spans.
+
+    A text can also be scanned in pieces by several scanners. One created with an offset scans the text
+    from there as if no match could span that position. Its state() after the piece can be handed to
+    resume of the scanner of the text in front of the next piece, see find_all with workers.
+    """
+
+    def __init__(self, regex: CompiledRegex, offset: int = 0):
+        self.regex = regex
+        self._text = ""
+        self._letters = regex.dfa.classes.encode("")
+        self._offset = offset  # position of self._text[0] in the whole text
+        self._threads: frozenset[int] = frozenset()  # state of the unanchored automaton after the text
+        self._last_idle = offset
+        self._begin: int | None = None
+        self._closed = False
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({repr(self.regex)}, position={self._offset + len(self._letters)})"
+
+    def feed(self, chunk: str | bytes) -> list[Match]:
+        """
+        Scans the next chunk of the text and returns the matches that can no longer change.
+        Chunks may also be bytes-like objects, read as latin-1, the matches then hold bytes.
+        """
+        offset = self._offset
+        out = [Match(self._text[first - offset:last - offset], (first, last), self.regex, first)
+               for first, last in self._advance(chunk)]
+        self._trim()
+        return out
+
+    def feed_spans(self, chunk: str | bytes) -> list[tuple[int, int]]:
+        """Like feed, but returns only the spans of the matches."""
+        out = self._advance(chunk)
+        self._trim()
+        return out
+
+    def _advance(self, chunk: str | bytes) -> list[tuple[int, int]]:
+        if self._closed:
+            raise ValueError("Scanner is closed.")
+        if not isinstance(chunk, (str, bytes)):
+            chunk = bytes(chunk)
+        regex = self.regex
+        forward = regex._forward
+        table, size, idle, accepting = forward.table, len(forward.classes), forward.start_state, forward.accepting
+        empty = regex.dfa.accepting[regex.dfa.start_state]
+        letters = regex.dfa.classes.encode(chunk)
+        position = self._offset + len(self._letters)
+        self._text = self._text + chunk if self._text else chunk
+        self._letters += letters
+
+        out: list[tuple[int, int]] = []
+        state = forward.state_of(self._threads)
+        last_idle, begin = self._last_idle, self._begin
+        prefix = regex._prefix
+        can_start = regex._first_letters if regex._first_letters is not None else b"\x01" * size
+        marks = None
+        if regex._first_letters is not None and not prefix:
+            marks = letters.translate(regex._first_letters)
+        view = memoryview(letters)
+        i, end = 0, len(letters)
+        while i < end:
+            if state == idle and not empty:
+                # no thread is alive in front of letters[i], skip to the next letter that can start a match,
+                # a prefix cut by the end of the chunk is read letter by letter
+                if prefix:
+                    found = letters.find(prefix, i)
+                    i = found if found >= 0 else max(i, end - len(prefix) + 1)
+                elif marks is not None:
+                    i = marks.find(1, i)
+                    if i < 0:
+                        break
+                if i >= end:
+                    break
+            skipped = i
+            for i, letter in enumerate(view[i:end], i):
+                if state == idle:
+                    if not empty and i != skipped and (prefix or not can_start[letter]):
+                        break
+                    last_idle = position + i
+                    if empty and begin is None:  # empty matches can start anywhere
+                        begin = position + i
+                next_state = table[state * size + letter]
+                if next_state < 0:
+                    next_state = forward.next_state(state, letter)
+                state = next_state
+                if accepting[state]:
+                    if begin is None:
+                        begin = last_idle
+                elif state == idle and begin is not None:
+                    out.extend(self._spans(begin, position + i + 1))
+                    begin = None
+            else:
+                i = end
+            forward.lookups += i - skipped
+        self._threads = forward.subset(state)
+        self._last_idle, self._begin = last_idle, begin
+        return out
+
+    def close(self) -> list[Match]:
+        """Ends the text and returns the matches that were still pending."""
+        offset = self._offset
+        out = [Match(self._text[first - offset:last - offset], (first, last), self.regex, first)
+               for first, last in self._finish()]
+        self._trim()
+        return out
+
+    def close_spans(self) -> list[tuple[int, int]]:
+        """Like close, but returns only the spans of the matches."""
+        out = self._finish()
+        self._trim()
+        return out
+
+    def _finish(self) -> list[tuple[int, int]]:
+        if self._closed:
+            return []
+        out = []
+        end = self._offset + len(self._letters)
+        if self._begin is not None and self._begin < end:
+            out = self._spans(self._begin, end)
+        self._closed = True
+        return out
+
+    def _spans(self, begin: int, end: int) -> list[tuple[int, int]]:
+        offset = self._offset
+        return [(first + offset, last + offset)
+                for first, last in self.regex._segment_spans(self._letters, begin - offset, end - offset)]
+
+    def state(self) -> tuple[frozenset[int], int, int | None]:
+        """
+        Returns the state of the scan after the text fed so far: the threads of the unanchored automaton
+        alive, the last position no thread could span and the begin of the pending stretch, if any.
+        """
+        return self._threads, self._last_idle, self._begin
+
+    def resume(self, data: str | bytes | mmap, position: int, state: tuple[frozenset[int], int, int | None]) \
+            -> None:
+        """
+        Continues from position of data in the state left by a scan of the text in front of it, see state.
+        The text the pending matches can include is taken from data.
+        """
+        threads, last_idle, begin = state
+        keep = begin if begin is not None else last_idle if threads else position
+        self._text = data[keep:position]
+        self._letters = self.regex.dfa.classes.encode(self._text)
+        self._offset = keep
+        self._threads, self._last_idle, self._begin = threads, last_idle, begin
+
+    def _trim(self) -> None:
+        """Drops the text that no pending match can include."""
+        if self._begin is not None and not self._closed:
+            self._forget(self._begin)
+        elif self._threads and not self._closed:
+            self._forget(self._last_idle)
+        else:
+            self._forget(self._offset + len(self._letters))
+
+    def _forget(self, position: int) -> None:
+        """Drops the text in front of position."""
+        self._text = self._text[position - self._offset:]
+        self._letters = self._letters[position - self._offset:]
+        self._offset = position
+
+
+_worker_regex: CompiledRegex | None = None  # the regex of a process of the pools of _parallel_spans and cli
+
+
+def _init_worker(packed: bytes) -> None:
+    global _worker_regex
+    _worker_regex = CompiledRegex.unpack(packed)
+
+
+def _scan_chunk(chunk: str | bytes, begin: int) \
+        -> tuple[list[tuple[int, int]], tuple[frozenset[int], int, int | None]]:
+    """
+    Scans a chunk that starts at begin of the text as if no thread were alive in front of it.
+    Returns the spans of the matches that are final and the state of the scanner at its end.
+    """
+    scanner = _worker_regex.scanner(begin)
+    spans = scanner.feed_spans(chunk)
+    return spans, scanner.state()
+
+
+def _scan_file_chunk(path: str | PathLike, begin: int, end: int) \
+        -> tuple[list[tuple[int, int]], tuple[frozenset[int], int, int | None]]:
+    """Scans the bytes begin:end of the file at path like _scan_chunk."""
+    with open(path, "rb") as file, mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+        return _scan_chunk(data[begin:end], begin)
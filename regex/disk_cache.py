@@ -0,0 +1,126 @@
+"""Persistent cache of packed regexes in a directory shared by processes"""
+
+from functools import cache
+from os import replace, utime, PathLike
+
+
+@cache
+def _library_fingerprint() -> str:
+    """Hash of the sources of the package, entries written by another version of it are never read."""
+    from hashlib import sha256
+    from pathlib import Path
+
+    digest = sha256()
+    for path in sorted(Path(__file__).parent.glob("*.py")):
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+class DiskCache:
+    """
+    Directory of packed regexes, one file per key.
+
+    An entry is written to a temporary file that is then renamed over it, so readers in other processes
+    see either the old or the new entry, never a partial one. When the entries take more than max_size
+    bytes, the least recently used ones are removed. The directory is listed only when the entries written
+    since it was last listed may have filled the cache. The cache is best effort: errors reading or
+    writing the directory make it miss instead of failing the compilation.
+    """
+
+    suffix = ".rx"
+
+    def __init__(self, directory: str | PathLike, max_size: int = 256 * 2 ** 20):
+        if max_size < 0:
+            raise ValueError("The size of the cache cannot be negative.")
+        from pathlib import Path  # loaded only once a disk cache is set, it is off by default
+
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+        self._size: int | None = None  # size of the entries when the directory was last listed, plus writes since
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({str(self.directory)!r}, max_size={self.max_size})"
+
+    def key(self, *parts) -> str:
+        """Returns the key of an entry described by parts, which also depends on the version of the package."""
+        from hashlib import sha256
+
+        return sha256(repr((_library_fingerprint(), parts)).encode()).hexdigest()
+
+    def get(self, key: str) -> bytes | None:
+        """Returns the contents of the entry, None if there is none."""
+        path = self._path(key)
+        try:
+            contents = path.read_bytes()
+        except OSError:
+            return None
+        try:
+            utime(path)  # marks the entry as recently used
+        except OSError:
+            pass
+        return contents
+
+    def put(self, key: str, contents: bytes) -> None:
+        """Stores the entry atomically and evicts the least recently used ones if the cache is too big."""
+        from tempfile import mkstemp  # only processes writing entries pay for importing it
+
+        try:
+            descriptor, temporary = mkstemp(suffix=".tmp", prefix=".", dir=self.directory)
+            try:
+                with open(descriptor, "wb") as file:
+                    file.write(contents)
+                replace(temporary, self._path(key))
+            except OSError:
+                self.directory.joinpath(temporary).unlink(missing_ok=True)  # temporary is an absolute path
+                return
+        except OSError:
+            return
+        if self._size is not None:
+            self._size += len(contents)
+        if self._size is None or self._size > self.max_size:
+            self._evict()
+
+    def remove(self, key: str) -> None:
+        self._path(key).unlink(missing_ok=True)
+
+    def clear(self) -> None:
+        """Removes every entry."""
+        for path in self.directory.glob("*" + self.suffix):
+            path.unlink(missing_ok=True)
+
+    def _path(self, key: str) -> 'Path':
+        return self.directory / (key + self.suffix)
+
+    def _evict(self) -> None:
+        entries = []
+        for path in self.directory.glob("*" + self.suffix):
+            try:
+                status = path.stat()
+            except OSError:
+                continue
+            entries.append((status.st_mtime, status.st_size, path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_size:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+        self._size = total
+
+
+_disk_cache: DiskCache | None = None
+
+
+def set_cache_dir(directory: str | PathLike | None, max_size: int = 256 * 2 ** 20) -> None:
+    """
+    Makes CompiledRegex and regex.compile look compiled patterns up in directory, and store them there,
+    before compiling them. None turns the disk cache off, it is off by default.
+    """
+    global _disk_cache
+    _disk_cache = DiskCache(directory, max_size) if directory is not None else None
+
+
+def get_disk_cache() -> DiskCache | None:
+    """Returns the disk cache set by set_cache_dir, None if it is off."""
+    return _disk_cache
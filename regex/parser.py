@@ -190,6 +190,14 @@ class Concatenation(BaseNode):
         return {"type": "concatenation", "operator": op, "contents": base}
 
 
+class Literals(NamedTuple):
+    """Literal strings found in every word matched by a node"""
+    exact: str | None  # the only word matched, if there is just one
+    prefix: str  # every word starts with it
+    suffix: str  # every word ends with it
+    factors: tuple[str, ...]  # every word contains each of them
+
+
 class ParsingError(Exception):
 
     def __init__(self, msg: str, index: int | None = None):
@@ -207,6 +215,80 @@ class Parser:
     def get_tree(self):
         return self.root.repr()
 
+    def get_required_literal(self) -> str:
+        """Returns the longest literal contained in every match of the expression, "" if there is none."""
+        literals = self._literals(self.get_tree())
+        candidates = [literals.prefix, *literals.factors, literals.suffix]
+        if literals.exact is not None:
+            candidates.append(literals.exact)
+        return max(candidates, key=len)
+
+    @classmethod
+    def _literals(cls, node: dict) -> Literals:
+        operator = node["operator"]
+        if operator == "*" or isinstance(operator, tuple) and operator[0] == 0:
+            return Literals(None, "", "", ())
+        body = cls._body_literals(node)
+        if operator is None:
+            return body
+        times = 1 if operator == "+" else operator[0]
+        if body.exact is not None:
+            if operator == (times, times):
+                return Literals(body.exact * times, "", "", ())
+            return Literals(None, body.exact * times, body.exact * times, (body.exact * times,))
+        return Literals(None, body.prefix, body.suffix, body.factors)
+
+    @classmethod
+    def _body_literals(cls, node: dict) -> Literals:
+        if node["type"] == "symbol":
+            return Literals(node["value"], "", "", ())
+
+        elif node["type"] == "special_symbol":
+            return Literals(None, "", "", ())
+
+        elif node["type"] == "alternative":
+            if len(node["contents"]) == 0:
+                return Literals(None, "", "", ())
+            alternatives = [cls._literals(sub_node) for sub_node in node["contents"]]
+            if len(alternatives) == 1:
+                return alternatives[0]
+            exact = {alternative.exact for alternative in alternatives}
+            if len(exact) == 1 and None not in exact:
+                return alternatives[0]
+            prefixes = [alt.exact if alt.exact is not None else alt.prefix for alt in alternatives]
+            suffixes = [alt.exact[::-1] if alt.exact is not None else alt.suffix[::-1] for alt in alternatives]
+            return Literals(None, cls._common_prefix(prefixes), cls._common_prefix(suffixes)[::-1], ())
+
+        elif node["type"] == "concatenation":
+            # run is the literal the text ends with just before the current sub-node
+            run, prefix, factors = "", None, []
+            for sub_node in node["contents"]:
+                literals = cls._literals(sub_node)
+                if literals.exact is not None:
+                    run += literals.exact
+                    continue
+                run += literals.prefix
+                if prefix is None:
+                    prefix = run
+                factors.append(run)
+                factors.extend(literals.factors)
+                run = literals.suffix
+            if prefix is None:
+                return Literals(run, "", "", ())
+            factors.append(run)
+            return Literals(None, prefix, run, tuple(factor for factor in factors if factor))
+
+        else:
+            raise ValueError("Invalid node type: " + node["type"])
+
+    @staticmethod
+    def _common_prefix(words: list[str]) -> str:
+        shortest = min(words, key=len)
+        for i, letter in enumerate(shortest):
+            if any(word[i] != letter for word in words):
+                return shortest[:i]
+        return shortest
+
     @classmethod
     def _parse(cls, lexer: Lexer) -> BaseNode:
         iter(lexer)
@@ -0,0 +1,123 @@
+"""Matching a text against many regular expressions at once"""
+
+from typing import Iterable, Iterator
+from threading import local
+from .automata import ENFA, CharClasses, LabelledDFA
+from .compiled import CompiledRegex, Match
+
+
+class _SetAutomata(local):
+    """The lazy automata of a RegexSet used by one thread, their tables grow and are flushed while texts are read"""
+
+    def __init__(self):
+        self.anchored: LabelledDFA | None = None
+        self.unanchored: LabelledDFA | None = None
+
+
+class RegexSet:
+    """
+    Compile many regular expressions into one automaton
+
+    The automata of the patterns are joined under one start state and determinized together, lazily,
+    in a cache of at most lazy_max_states states. Each state knows the IDs, the indices in patterns,
+    of the patterns that match a text ending there, so matches and is_match read the text once
+    whatever the number of patterns. Every thread gets automata of its own.
+    """
+
+    def __init__(self, patterns: Iterable[str], lazy_max_states: int = 10000):
+        self.patterns = list(patterns)
+        self._lazy_max_states = lazy_max_states
+        skeleton, _ = ENFA.join([ENFA.get_skeleton(pattern) for pattern in self.patterns])
+        classes = CharClasses.from_transitions(skeleton.transitions)
+        enfa, ends = ENFA.join([ENFA.get_enfa(pattern, classes) for pattern in self.patterns])
+        self.classes = classes
+        self._enfa, self._ends = enfa, ends
+        self._automata = _SetAutomata()
+        # patterns matching the empty string match every text that has a position to match at
+        self._empty = self._anchored.labels[self._anchored.start_state]
+        self._union: CompiledRegex | None = None
+
+    @property
+    def _anchored(self) -> LabelledDFA:
+        automata = self._automata
+        if automata.anchored is None:
+            automata.anchored = LabelledDFA(self._enfa, self._ends, self.classes, self._lazy_max_states)
+        return automata.anchored
+
+    @property
+    def _unanchored(self) -> LabelledDFA:
+        automata = self._automata
+        if automata.unanchored is None:
+            automata.unanchored = LabelledDFA(self._enfa, self._ends, self.classes, self._lazy_max_states,
+                                              anchored=False)
+        return automata.unanchored
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}({self.patterns!r})"
+
+    def __len__(self) -> int:
+        return len(self.patterns)
+
+    def matches(self, text: str) -> list[int]:
+        """Returns the sorted IDs of the patterns that match somewhere in text."""
+        if not text:
+            return []
+        found = set(self._empty)
+        automaton = self._unanchored
+        table, size, accepting, labels = automaton.table, len(self.classes), automaton.accepting, automaton.labels
+        state = automaton.start_state
+        steps = 0
+        for steps, letter in enumerate(self.classes.encode(text), 1):
+            next_state = table[state * size + letter]
+            if next_state < 0:
+                next_state = automaton.next_state(state, letter)
+            state = next_state
+            if accepting[state]:
+                found.update(labels[state])
+                if len(found) == len(self.patterns):
+                    break
+        automaton.lookups += steps
+        return sorted(found)
+
+    def is_match(self, text: str) -> bool:
+        """Tells whether any of the patterns matches somewhere in text."""
+        if not text:
+            return False
+        if self._empty:
+            return True
+        automaton = self._unanchored
+        table, size, accepting = automaton.table, len(self.classes), automaton.accepting
+        state = automaton.start_state
+        steps = 0
+        for steps, letter in enumerate(self.classes.encode(text), 1):
+            next_state = table[state * size + letter]
+            if next_state < 0:
+                next_state = automaton.next_state(state, letter)
+            state = next_state
+            if accepting[state]:
+                break
+        automaton.lookups += steps
+        return bool(accepting[state])
+
+    def finditer(self, text: str) -> Iterator[tuple[int, Match]]:
+        """
+        Yields the matches of the alternative of all the patterns, like CompiledRegex.finditer does,
+        each one with the smallest ID of the patterns that match exactly its substring.
+        """
+        if self._union is None:
+            self._union = CompiledRegex("|".join(f"({pattern})" for pattern in self.patterns),
+                                        lazy_max_states=self._lazy_max_states)
+        for match in self._union.finditer(text):
+            yield self._label(match.get_str), match
+
+    def _label(self, substring: str) -> int:
+        automaton = self._anchored
+        table, size = automaton.table, len(self.classes)
+        state = automaton.start_state
+        for letter in self.classes.encode(substring):
+            next_state = table[state * size + letter]
+            if next_state < 0:
+                next_state = automaton.next_state(state, letter)
+            state = next_state
+        automaton.lookups += len(substring)
+        return min(automaton.labels[state])
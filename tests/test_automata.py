@@ -1,7 +1,10 @@
 """tests for automata"""
 
+import struct
 import unittest as ut
+from array import array
 import regex.automata as aut
+from regex.parser import parse
 
 
 class ConversionTestENFA(ut.TestCase):
@@ -201,5 +204,261 @@ class ConversionTestNFA(ut.TestCase):
         )
 
 
+class EpsilonClosureTest(ut.TestCase):
+
+    def test_closures(self):
+        transitions = {(0, ''): {1}, (1, ''): {2, 3}, (2, ''): {1}, (3, 'a'): {4}, (4, ''): {0}}
+        self.assertDictEqual(
+            aut.NFA._compute_e_closures({0, 1, 2, 3, 4}, transitions),
+            {0: {0, 1, 2, 3}, 1: {1, 2, 3}, 2: {1, 2, 3}, 3: {3}, 4: {0, 1, 2, 3, 4}}
+        )
+
+    def test_shared_component(self):
+        transitions = {(0, ''): {1}, (1, ''): {2}, (2, ''): {0}}
+        closures = aut.NFA._compute_e_closures({0, 1, 2}, transitions)
+        self.assertIs(closures[0], closures[1])
+        self.assertIs(closures[1], closures[2])
+
+    def test_long_chain(self):
+        enfa = aut.ENFA.get_enfa(r"(ab?|cd*){1000}")
+        closures = aut.NFA._compute_e_closures(enfa.states, enfa.transitions)
+        self.assertEqual(len(closures), len(enfa.states))
+        self.assertIn(enfa.end_state, closures[enfa.end_state])
+
+
+class MinimizationTest(ut.TestCase):
+
+    patterns = [
+        r"a+b+", r"a*b*", r"|", r"a[]a", r"(a|b)*a(a|b){5}", r"(ab|cd)*e?f{2,4}",
+        r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})", r"(www\.)?[-A-Za-z0-9_\.]+\.(com|pl|io)",
+        r"if|else|elif|while|for|in|is|not|and|or|import|from|return|yield"
+    ]
+
+    @staticmethod
+    def _isomorphic(first: aut.DFA, second: aut.DFA) -> bool:
+        mapping = {first.start_state: second.start_state}
+        queue = [first.start_state]
+        for state in queue:
+            if (state in first.end_states) != (mapping[state] in second.end_states):
+                return False
+            for letter in first.alphabet:
+                target = first.transitions[(state, letter)]
+                if target not in mapping:
+                    mapping[target] = second.transitions[(mapping[state], letter)]
+                    queue.append(target)
+                elif mapping[target] != second.transitions[(mapping[state], letter)]:
+                    return False
+        return len(mapping) == len(first.states) == len(second.states)
+
+    def test_algorithms_agree(self):
+        for pattern in self.patterns:
+            dfa = aut.DFA.get_dfa(aut.NFA.get_nfa(aut.ENFA.get_enfa(pattern)))
+            hopcroft = dfa.minimalize("hopcroft")
+            relations = dfa.minimalize("relations")
+            self.assertTrue(self._isomorphic(hopcroft, relations), pattern)
+
+    def test_numbering(self):
+        dfa = aut.DFA.get_dfa(aut.NFA.get_nfa(aut.ENFA.get_enfa(r"a*b*"))).minimalize()
+        self.assertEqual(dfa.start_state, 0)
+        self.assertEqual(dfa.states, frozenset(range(3)))
+
+    def test_invalid_algorithm(self):
+        dfa = aut.DFA.get_dfa(aut.NFA.get_nfa(aut.ENFA.get_enfa(r"a")))
+        self.assertRaises(ValueError, dfa.minimalize, "brzozowski")
+
+    def test_rounds(self):
+        dfa = aut.DFA.get_dfa(aut.NFA.get_nfa(aut.ENFA.get_enfa(r"(a|b)*a(a|b){2}")))
+        self.assertIsNone(dfa.minimization_rounds)
+        self.assertGreater(dfa.minimalize("hopcroft").minimization_rounds, 0)
+        self.assertGreater(dfa.minimalize("relations").minimization_rounds, 0)
+
+    def test_parsed_input(self):
+        parsed = parse(r"(ab|cd)*e?f{2,4}")
+        self.assertTrue(self._isomorphic(aut.DFA.from_enfa(aut.ENFA.get_enfa(parsed)).minimalize(),
+                                         aut.DFA.from_enfa(aut.ENFA.get_enfa(r"(ab|cd)*e?f{2,4}")).minimalize()))
+
+
+class DeterminizationTest(ut.TestCase):
+
+    def test_same_minimal_dfa(self):
+        for pattern in MinimizationTest.patterns:
+            enfa = aut.ENFA.get_enfa(pattern)
+            through_nfa = aut.DFA.get_dfa(aut.NFA.get_nfa(enfa)).minimalize()
+            on_the_fly = aut.DFA.from_enfa(enfa).minimalize()
+            self.assertTrue(MinimizationTest._isomorphic(through_nfa, on_the_fly), pattern)
+
+    def test_reachable_subsets_only(self):
+        enfa = aut.ENFA.get_enfa(r"a[bc]")
+        dfa = aut.DFA.from_enfa(enfa)
+        self.assertEqual(dfa.start_state, 0)
+        self.assertEqual(len(dfa.states), 4)
+        self.assertEqual(len(dfa.end_states), 1)
+
+
+class CharClassesTest(ut.TestCase):
+
+    @classmethod
+    def _classes(cls, re: str) -> aut.CharClasses:
+        return aut.CharClasses.from_transitions(aut.ENFA.get_enfa(re).transitions)
+
+    def test_partition(self):
+        classes = self._classes(r"[a-c]x|\d")
+        self.assertEqual(len(classes), 4)
+        self.assertEqual(classes['a'], classes['c'])
+        self.assertNotEqual(classes['a'], classes['x'])
+        self.assertEqual(classes['0'], classes['9'])
+        self.assertEqual(classes['z'], 0)
+        self.assertEqual(classes.members(classes['x']), frozenset('x'))
+        self.assertIn('z', classes.members(0))
+
+    def test_special_symbols(self):
+        self.assertEqual(len(self._classes(r".")), 2)
+        self.assertEqual(len(self._classes(r"\w\W")), 4)
+        self.assertEqual(len(self._classes(r"\S")), 2)
+
+    def test_compressed_dfa(self):
+        for pattern in MinimizationTest.patterns:
+            enfa = aut.ENFA.get_enfa(pattern)
+            classes = aut.CharClasses.from_transitions(enfa.transitions)
+            compressed = aut.DFA.from_enfa(enfa.compress(classes), classes).minimalize()
+            plain = aut.DFA.from_enfa(enfa).minimalize()
+            self.assertEqual(compressed.alphabet, frozenset(range(len(classes))))
+            self.assertLessEqual(len(compressed.states) - 1, len(plain.states), pattern)
+            for letter in plain.alphabet:
+                self.assertIn(classes[letter], compressed.alphabet)
+
+
+class RepetitionTest(ut.TestCase):
+
+    patterns = [r"a{3}", r"(ab|c){2,4}d", r"[a-z]{0,3}x", r"(x[a-c]{2,3}y){2}", r"(a{2}b?){1,3}", r"\d{0}"]
+
+    def test_same_automaton(self):
+        for pattern in self.patterns:
+            classes = aut.CharClasses.from_transitions(aut.ENFA.get_skeleton(pattern).transitions)
+            pasted = aut.ENFA.get_enfa(pattern, classes)
+            expanded = aut.ENFA.get_enfa(pattern).compress(classes)
+            self.assertTrue(MinimizationTest._isomorphic(aut.DFA.from_enfa(pasted, classes).minimalize(),
+                                                         aut.DFA.from_enfa(expanded, classes).minimalize()), pattern)
+
+    def test_skeleton_classes(self):
+        for pattern in self.patterns:
+            skeleton = aut.CharClasses.from_transitions(aut.ENFA.get_skeleton(pattern).transitions)
+            full = aut.CharClasses.from_transitions(aut.ENFA.get_enfa(pattern).transitions)
+            self.assertEqual(len(skeleton), len(full), pattern)
+
+    def test_large_repetition(self):
+        classes = aut.CharClasses.from_transitions(aut.ENFA.get_skeleton(r"[a-z]{1,2000}").transitions)
+        enfa = aut.ENFA.get_enfa(r"[a-z]{1,2000}", classes)
+        self.assertEqual(len(enfa.states), 2004)
+        self.assertLess(len(enfa.transitions), 3 * 2004)
+
+    def test_limit(self):
+        with self.assertRaises(aut.RepetitionLimitExceeded) as error:
+            aut.ENFA.get_enfa(r"(a{1000}){1000}")
+        self.assertEqual(error.exception.limit, aut.ENFA.repetition_limit)
+
+
+class TableTest(ut.TestCase):
+
+    def test_table(self):
+        enfa = aut.ENFA.get_enfa(r"ab*")
+        classes = aut.CharClasses.from_transitions(enfa.transitions)
+        dfa = aut.DFA.from_enfa(enfa.compress(classes), classes).minimalize()
+        dfa.detect_sinkhole()
+        dfa.build_table()
+        size = len(classes)
+        self.assertEqual(len(dfa.table), len(dfa.states) * size)
+        for (state, letter), target in dfa.transitions.items():
+            self.assertEqual(dfa.table[state * size + letter], target)
+        self.assertEqual(dfa.dead_state, dfa.sink_state)
+        self.assertEqual([state for state in dfa.states if dfa.accepting[state]], sorted(dfa.end_states))
+
+    def test_encode(self):
+        classes = aut.CharClasses({'a': 1, 'b': 2})
+        self.assertEqual(classes.encode("abc\u0105b"), bytes([1, 2, 0, 0, 2]))
+        full = aut.CharClasses({chr(code): 1 for code in range(256)})
+        self.assertEqual(full.encode("a\u0105"), bytes([1, 0]))
+        wide = aut.CharClasses({chr(code): code + 1 for code in range(300)})
+        self.assertEqual(wide.encode("a\u0105\u0200"), array('H', [98, 262, 0]))
+        self.assertEqual(wide.encode(b"a\xff"), array('H', [98, 256]))
+        self.assertRaises(ValueError, aut.CharClasses, {"a": 1 << 16})
+
+
+class SerializeTest(ut.TestCase):
+
+    def test_round_trip(self):
+        enfa = aut.ENFA.get_enfa(r"([a-z]+)@x\.(pl|com)")
+        classes = aut.CharClasses.from_transitions(enfa.transitions)
+        dfa = aut.DFA.from_enfa(enfa.compress(classes), classes).minimalize()
+        dfa.detect_sinkhole()
+        expected = dfa.to_enfa()
+        dfa.build_table()
+        unpacked = aut.DFA.unpack(dfa.serialize())
+        self.assertEqual(list(unpacked.table), list(dfa.table))
+        self.assertEqual(unpacked.accepting, dfa.accepting)
+        self.assertEqual((unpacked.start_state, unpacked.dead_state), (dfa.start_state, dfa.dead_state))
+        self.assertEqual(unpacked.classes.class_of, dfa.classes.class_of)
+        self.assertEqual(unpacked.to_enfa().transitions, expected.transitions)
+
+    def test_wide_classes(self):
+        enfa = aut.ENFA.get_enfa("".join(map(chr, range(0x100, 0x100 + 300))))
+        classes = aut.CharClasses.from_transitions(enfa.transitions)
+        dfa = aut.DFA.from_enfa(enfa.compress(classes), classes).minimalize()
+        dfa.build_table()
+        unpacked = aut.DFA.unpack(dfa.serialize())
+        self.assertEqual(len(unpacked.classes), 301)
+        self.assertEqual(unpacked.classes.class_of, dfa.classes.class_of)
+        self.assertEqual(list(unpacked.table), list(dfa.table))
+
+    def test_out_of_range(self):
+        enfa = aut.ENFA.get_enfa(r"ab+")
+        classes = aut.CharClasses.from_transitions(enfa.transitions)
+        dfa = aut.DFA.from_enfa(enfa.compress(classes), classes).minimalize()
+        dfa.build_table()
+        data = dfa.serialize()
+        states, size, characters = len(dfa.accepting), len(classes), len(classes.class_of)
+        table = 28 + 4 * characters
+        class_ids = table + 4 * states * size
+        corrupted = [
+            data[:16] + struct.pack("<i", states) + data[20:],  # start state
+            data[:20] + struct.pack("<i", -2) + data[24:],  # dead state
+            data[:class_ids] + bytes([size]) + data[class_ids + 1:],
+        ]
+        for contents in corrupted:
+            self.assertRaises(ValueError, aut.DFA.unpack, contents)
+        for target in (states, -1):
+            contents = data[:table] + struct.pack("<i", target) + data[table + 4:]
+            self.assertRaises(ValueError, aut.DFA.unpack, contents, validate=True)
+            self.assertEqual(aut.DFA.unpack(contents).table[0], target)
+
+    def test_bitmap(self):
+        for flags in (b"", b"\x01", b"\x00\x01\x01" * 7, b"\x01" * 64):
+            bitmap = aut._to_bitmap(flags)
+            self.assertEqual(len(bitmap), (len(flags) + 7) // 8)
+            self.assertEqual(aut._from_bitmap(bitmap, len(flags)), flags)
+
+
+class JoinTest(ut.TestCase):
+
+    def test_labels(self):
+        patterns = [r"ab", r"a+", r"b|ab"]
+        joined, ends = aut.ENFA.join([aut.ENFA.get_enfa(pattern) for pattern in patterns])
+        self.assertEqual(len(joined.states), sum(len(aut.ENFA.get_enfa(p).states) for p in patterns) + 2)
+        classes = aut.CharClasses.from_transitions(joined.transitions)
+        joined = joined.compress(classes)
+        anchored = aut.LabelledDFA(joined, ends, classes)
+        state = anchored.start_state
+        labels = []
+        for letter in classes.encode("ab"):
+            state = anchored.next_state(state, letter)
+            labels.append(anchored.labels[state])
+        self.assertEqual(labels, [{1}, {0, 2}])
+        unanchored = aut.LabelledDFA(joined, ends, classes, anchored=False)
+        state = unanchored.start_state
+        for letter in classes.encode("bab"):
+            state = unanchored.next_state(state, letter)
+        self.assertEqual(unanchored.labels[state], {0, 2})
+
+
 if __name__ == '__main__':
     ut.main()
@@ -0,0 +1,102 @@
+"""Tests for regex/cache.py"""
+
+import sys
+import unittest as ut
+from threading import Thread
+import regex
+from regex.cache import PatternCache
+from regex.compiled import CompiledRegex, Match
+
+
+class PatternCacheTest(ut.TestCase):
+
+    def test_hits_and_misses(self):
+        cache = PatternCache()
+        first = cache.get(r"a+b+")
+        self.assertIs(cache.get(r"a+b+"), first)
+        self.assertIsNot(cache.get(r"a*b*"), first)
+        info = cache.info()
+        self.assertEqual((info.hits, info.misses, info.entries), (1, 2, 2))
+
+    def test_lru_eviction(self):
+        cache = PatternCache(max_entries=2)
+        cache.get(r"a")
+        cache.get(r"b")
+        cache.get(r"a")
+        cache.get(r"c")
+        self.assertEqual(cache.info().evictions, 1)
+        misses = cache.info().misses
+        cache.get(r"a")
+        self.assertEqual(cache.info().misses, misses)
+        cache.get(r"b")
+        self.assertEqual(cache.info().misses, misses + 1)
+
+    def test_size_limit(self):
+        size = PatternCache.entry_size(CompiledRegex(r"abc"))
+        cache = PatternCache(max_size=2 * size)
+        for pattern in (r"abc", r"bcd", r"cde"):
+            cache.get(pattern)
+        info = cache.info()
+        self.assertEqual(info.entries, 2)
+        self.assertLessEqual(info.size, 2 * size)
+
+    def test_lazy_size(self):
+        lazy = CompiledRegex(r"(a|b)*a(a|b){3}", engine="lazy", lazy_max_states=100)
+        self.assertEqual(PatternCache.entry_size(lazy), 3 * 100 * len(lazy.dfa.classes))
+        eager = CompiledRegex(r"(a|b)*a(a|b){3}", engine="dfa", lazy_max_states=100)
+        self.assertEqual(PatternCache.entry_size(eager), len(eager.dfa.table) + 2 * 100 * len(eager.dfa.classes))
+        cache = PatternCache(max_size=PatternCache.entry_size(lazy))
+        cache.get(r"(a|b)*a(a|b){3}", engine="lazy", lazy_max_states=100)
+        cache.get(r"ab", engine="lazy", lazy_max_states=100)
+        self.assertEqual(cache.info().entries, 1)
+
+    def test_single_flight(self):
+        cache = PatternCache()
+        results = []
+        threads = [Thread(target=lambda: results.append(cache.get(r"([a-z0-9_\.]+)@([-\da-z\.]+)")))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(cache.info().misses, 1)
+        self.assertTrue(all(result is results[0] for result in results))
+
+    def test_errors_are_not_cached(self):
+        cache = PatternCache()
+        self.assertRaises(SyntaxError, cache.get, "(a")
+        self.assertRaises(SyntaxError, cache.get, "(a")
+        self.assertEqual(cache.info().entries, 0)
+
+
+class ModuleFunctionsTest(ut.TestCase):
+
+    def test_functions(self):
+        regex.purge()
+        text = "aaabab"
+        self.assertEqual(regex.search(r"b+", text), Match(text, (3, 4)))
+        self.assertEqual(regex.match(r"a+", text), Match(text, (0, 3)))
+        self.assertEqual(regex.full_match(r"[ab]+", text), Match(text, (0, 6)))
+        self.assertEqual(regex.find_all(r"b", text), [Match(text, (3, 4)), Match(text, (5, 6))])
+        self.assertEqual(list(regex.finditer(r"b", text)), [Match(text, (3, 4)), Match(text, (5, 6))])
+        self.assertTrue(regex.is_match(r"b", text))
+        self.assertEqual(regex.count(r"b", text), 2)
+        self.assertIs(regex.compile(r"b+"), regex.compile(r"b+"))
+        self.assertEqual(regex.cache_info().misses, 4)
+
+    def test_module_names(self):
+        import regex.compiled as compiled
+        from regex.compile import CompiledRegex as Former
+        self.assertIs(compiled.CompiledRegex, CompiledRegex)
+        self.assertIs(Former, CompiledRegex)
+        self.assertTrue(callable(regex.compile))
+        self.assertIsInstance(regex.compile(r"b+"), CompiledRegex)
+        import regex.compile as former
+        self.assertIs(former, sys.modules["regex.compile"])
+        self.assertIs(former.CompiledRegex, CompiledRegex)
+        self.assertIs(former(r"b+"), regex.compile(r"b+"))
+        self.assertEqual(repr(CompiledRegex(r"b+")), "compile.CompiledRegex('b+')")
+
+
+if __name__ == '__main__':
+    ut.main()
@@ -0,0 +1,47 @@
+"""Tests for regex/cli.py"""
+
+import sys
+import unittest as ut
+from pathlib import Path
+from subprocess import run
+from tempfile import TemporaryDirectory
+
+
+class CommandLineTest(ut.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        root = Path(self.directory.name)
+        (root / "sub").mkdir()
+        (root / "a.txt").write_bytes(b"id=1 x\nfoo id=22\n\nid=333 id=4\n")
+        (root / "sub" / "b.txt").write_bytes(b"nothing\n")
+        (root / "sub" / "c.log").write_bytes(b"zz id=9")
+        (root / "empty").write_bytes(b"")
+        self.root = root
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def grep(self, *args: str) -> tuple[int, list[str]]:
+        result = run([sys.executable, "-m", "regex", *args], capture_output=True,
+                     cwd=Path(__file__).resolve().parent.parent)
+        return result.returncode, result.stdout.decode().replace(str(self.root), "").splitlines()
+
+    def test_lines(self):
+        for jobs in ("1", "3"):
+            self.assertEqual(self.grep(r"id=\d+", str(self.root), "-j", jobs), (0, [
+                "/a.txt:1:1:id=1", "/a.txt:2:5:id=22", "/a.txt:4:1:id=333", "/a.txt:4:8:id=4", "/sub/c.log:1:4:id=9"]))
+
+    def test_modes(self):
+        self.assertEqual(self.grep("-c", r"id=\d+", str(self.root)),
+                         (0, ["/a.txt:4", "/empty:0", "/sub/b.txt:0", "/sub/c.log:1"]))
+        self.assertEqual(self.grep("-l", r"id=\d+", str(self.root)), (0, ["/a.txt", "/sub/c.log"]))
+
+    def test_exit_status(self):
+        self.assertEqual(self.grep("qq", str(self.root)), (1, []))
+        self.assertEqual(self.grep("qq", str(self.root / "missing"))[0], 2)
+        self.assertEqual(self.grep("(", str(self.root))[0], 2)
+
+
+if __name__ == '__main__':
+    ut.main()
@@ -0,0 +1,66 @@
+"""Tests for regex/codegen.py"""
+
+import unittest as ut
+from regex.automata import ENFA, DFA, CharClasses
+from regex.compiled import CompiledRegex
+from regex.codegen import generate_source, compile_dfa
+
+
+class CodegenTest(ut.TestCase):
+
+    patterns = [r"\d{3}-\d{3}-\d{4}", r"\d+", r"a*", r"a*b*", r"(a|b)*a(a|b){3}", r"zażółć|ż+", r"|",
+                r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})", r"[^a]b+c?"]
+    texts = ["", "555-123-4567", "555-123-456", "x 555-123-4567 y", "12345", "aaab", "bab", "abbab aaaa",
+             "zażółć żż", "adam.kowalski@gmail.pl", "xbbc abc", "aaaa"]
+
+    def test_same_results(self):
+        for pattern in self.patterns:
+            reg = CompiledRegex(pattern, engine="dfa")
+            generated = CompiledRegex(pattern, engine="dfa", codegen=True)
+            self.assertIsNotNone(generated._generated)
+            for text in self.texts:
+                for method in ("full_match", "match", "search"):
+                    self.assertEqual(getattr(generated, method)(text), getattr(reg, method)(text),
+                                     (pattern, text, method))
+
+    def test_functions(self):
+        reg = CompiledRegex(r"\d{3}-\d+", engine="dfa")
+        generated = compile_dfa(reg.dfa)
+        letters = reg.dfa.classes.encode("ab 123-45 x")
+        self.assertFalse(generated.full_match(letters))
+        self.assertTrue(generated.full_match(reg.dfa.classes.encode("123-45")))
+        self.assertEqual(generated.match(letters, 3), 9)
+        self.assertEqual(generated.match(letters, 0), -1)
+        self.assertEqual(generated.search(letters, 0), (3, 9))
+        self.assertIsNone(generated.search(letters, 4))
+
+    def test_chain_inlined(self):
+        source = generate_source(CompiledRegex(r"\d{3}-\d{4}", engine="dfa").dfa)
+        self.assertNotIn("if state <", source)
+
+    def test_needs_table(self):
+        classes = CharClasses.from_transitions(ENFA.get_skeleton("ab").transitions)
+        dfa = DFA.from_enfa(ENFA.get_enfa("ab", classes), classes)
+        self.assertRaises(ValueError, generate_source, dfa)
+
+    def test_not_generated(self):
+        self.assertIsNone(CompiledRegex(r"\d+", engine="lazy", codegen=True)._generated)
+        self.assertIsNone(CompiledRegex(r"\d+", engine="dfa")._generated)
+        CompiledRegex.codegen_state_limit, limit = 2, CompiledRegex.codegen_state_limit
+        try:
+            reg = CompiledRegex(r"\d{3}-\d+", engine="dfa", codegen=True)
+        finally:
+            CompiledRegex.codegen_state_limit = limit
+        self.assertIsNone(reg._generated)
+        self.assertEqual(reg.search("ab 123-45"), CompiledRegex(r"\d{3}-\d+").search("ab 123-45"))
+
+    def test_pack(self):
+        reg = CompiledRegex(r"\d{3}-\d+", engine="dfa", codegen=True)
+        unpacked = CompiledRegex.unpack(reg.pack())
+        self.assertIsNotNone(unpacked._generated)
+        self.assertEqual(unpacked.search("ab 123-45"), reg.search("ab 123-45"))
+        self.assertIsNone(CompiledRegex.unpack(CompiledRegex(r"\d+").pack())._generated)
+
+
+if __name__ == '__main__':
+    ut.main()
@@ -1,7 +1,20 @@
 """Tests for regex/test_compile.py"""
 
+import sys
 import unittest as ut
-from regex.compile import CompiledRegex, Match
+from random import Random
+from threading import Thread
+from unittest import mock
+from subprocess import run
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from mmap import mmap, ACCESS_READ
+from regex.compiled import CompiledRegex, Match
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
 
 class CompileTest(ut.TestCase):
@@ -229,6 +242,421 @@ notanemailalsogmail.com
             reg.search(text),
             Match(text, (0, 0))
         )
+        reg = CompiledRegex(r"abcde|c")
+        text = 'abcde'
+        self.assertEqual(
+            reg.search(text),
+            Match(text, (0, 5))
+        )
+
+    def test_long_matches(self):
+        reg = CompiledRegex(r"a|a*b")
+        text = 'a' * 5000
+        self.assertEqual(len(reg.find_all(text)), 5000)
+        text = 'a' * 5000 + 'b'
+        self.assertEqual(reg.find_all(text), [Match(text, (0, 5001))])
+        reg = CompiledRegex(r"\w+")
+        text = ('x' * 5000 + ' ') * 3
+        self.assertEqual([match.span for match in reg.find_all(text)], [(0, 5000), (5001, 10001), (10002, 15002)])
+
+    def test_start_letters(self):
+        reg = CompiledRegex(r"ERROR: \w+")
+        self.assertEqual(reg._prefix, reg.dfa.classes.encode("ERROR: "))
+        reg = CompiledRegex(r"[A-Z]+\d|\d")
+        self.assertEqual(reg._prefix, b"")
+        self.assertEqual(reg.dfa.classes.encode("AZ").translate(reg._first_letters), b"\x01\x01")
+        self.assertEqual(reg.dfa.classes.encode("a0 ").translate(reg._first_letters), b"\x00\x01\x00")
+        text = "error: x " * 1000 + "ERROR: x ERRO ERROR: y"
+        reg = CompiledRegex(r"ERROR: \w+")
+        self.assertEqual([match.get_str for match in reg.find_all(text)], ["ERROR: x", "ERROR: y"])
+
+    def test_required_literal(self):
+        reg = CompiledRegex(r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})")
+        self.assertEqual(reg._literal, "@")
+        text = "no address here\n" * 500 + "mail adam.k@gmail.com or x@y.io, not @ nor a@b"
+        self.assertEqual([match.get_str for match in reg.find_all(text)], ["adam.k@gmail.com", "x@y.io"])
+        self.assertEqual(reg.search(text).get_str, "adam.k@gmail.com")
+
+    def test_finditer(self):
+        reg = CompiledRegex(r"id=\d+")
+        text = "x id=1 y id=22 " * 1000
+        matches = reg.finditer(text)
+        self.assertEqual(next(matches), Match(text, (2, 6)))
+        self.assertLess(reg._forward.lookups, 100)
+        self.assertEqual(next(matches), Match(text, (9, 14)))
+        self.assertEqual([Match(text, (2, 6)), Match(text, (9, 14))] + list(matches), reg.find_all(text))
+
+    def test_is_match_and_count(self):
+        cases = [(r"id=\d+", "x id=1 y id=22 "), (r"a*", "baab"), (r"a*", ""), (r"q", "abc"), (r"a|a*b", "aaab aa"),
+                 (r"ERROR: [a-z]+", "INFO: ok\nERROR: disk"), (r"ERROR: [a-z]+", "ERROR: 1")]
+        for pattern, text in cases:
+            reg = CompiledRegex(pattern)
+            self.assertEqual(reg.is_match(text), reg.search(text) is not None, (pattern, text))
+            self.assertEqual(reg.count(text), len(reg.find_all(text)), (pattern, text))
+
+    def test_is_match_stops_early(self):
+        reg = CompiledRegex(r"[a-z]+\d")
+        self.assertTrue(reg.is_match("ab1" + "x" * 10000))
+        self.assertLess(reg._forward.lookups, 10)
+
+    def test_over_256_classes(self):
+        pattern = "".join("\\x%02x" % code for code in range(256))
+        text = "".join(map(chr, range(256)))
+        for engine in ("dfa", "lazy"):
+            reg = CompiledRegex(pattern, engine=engine, codegen=True)
+            self.assertEqual(len(reg.dfa.classes), 257)
+            self.assertTrue(reg.full_match(text))
+            self.assertEqual(reg.search("x" + text).span, (1, 257))
+            self.assertEqual([match.span for match in reg.find_all(text * 2 + "x")], [(0, 256), (256, 512)])
+            self.assertEqual(list(reg.scan(("x" + text).encode("latin-1"))), [(1, 257)])
+        unpacked = CompiledRegex.unpack(CompiledRegex(pattern).pack())
+        self.assertEqual(unpacked.count(text * 3), 3)
+
+    def test_non_latin1(self):
+        cases = [(r"ż+", "aż żż", [(1, 2), (3, 5)]),
+                 (r"zażółć|ż+", "x zażółć żż", [(2, 8), (9, 11)]),
+                 (r"(((c){2}|ż)(\W.)*)((b))", "b żbż", [(2, 4)])]
+        for pattern, text, expected in cases:
+            for engine in ("dfa", "lazy"):
+                reg = CompiledRegex(pattern, engine=engine)
+                self.assertEqual([match.span for match in reg.find_all(text)], expected, (pattern, engine))
+                unpacked = CompiledRegex.unpack(reg.pack())
+                self.assertEqual([match.span for match in unpacked.find_all(text)], expected, (pattern, engine))
+        self.assertEqual(CompiledRegex(r"ż+").full_match("żż").span, (0, 2))
+        self.assertIsNone(CompiledRegex(r"ż+").full_match("żx"))
+
+    def test_find_spans(self):
+        for pattern, text in ((r"id=\d+", "x id=1 y id=22 "), (r"a*", "baab"), (r"q", "abc"), (r"a|a*b", "aaab aa")):
+            reg = CompiledRegex(pattern)
+            spans = reg.find_spans(text)
+            self.assertEqual(spans.typecode, "q")
+            self.assertEqual(list(zip(spans[::2], spans[1::2])), [match.span for match in reg.find_all(text)])
+            self.assertEqual(reg.find_spans(text.encode()), spans)
+        self.assertFalse(hasattr(Match("ab", (0, 1)), "__dict__"))
+
+
+class ScannerTest(ut.TestCase):
+
+    cases = [
+        (r"id=\d+", "x id=1 y id=22 z id=333 " * 20),
+        (r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})", "adam.kowalski@gmail.pl notanemail@ x@y.io " * 5),
+        (r"a*b*", "aaabbbaab\nabbab\nccab"),
+        (r"a|a*b", "aaaaaaaaab aaaa"),
+    ]
+
+    def test_chunks(self):
+        for pattern, text in self.cases:
+            reg = CompiledRegex(pattern)
+            expected = [(match.span, match.get_str) for match in reg.find_all(text)]
+            for size in (1, 2, 7, len(text)):
+                scanner = reg.scanner()
+                matches = []
+                for i in range(0, len(text), size):
+                    matches += scanner.feed(text[i:i + size])
+                matches += scanner.close()
+                self.assertEqual([(match.span, match.get_str) for match in matches], expected, (pattern, size))
+
+    def test_bounded_buffer(self):
+        scanner = CompiledRegex(r"id=\d+").scanner()
+        matches = []
+        for i in range(1000):
+            matches += scanner.feed(f"line {i} id={i}\n")
+            self.assertLess(len(scanner._text), 20)
+        self.assertEqual(len(matches), 1000)
+        self.assertEqual(matches[-1].span, (15773, 15779))
+        self.assertEqual(matches[-1].get_str, "id=999")
+
+    def test_closed(self):
+        scanner = CompiledRegex(r"a+").scanner()
+        self.assertEqual(scanner.feed("baa"), [])
+        self.assertEqual([match.span for match in scanner.close()], [(1, 3)])
+        self.assertRaises(ValueError, scanner.feed, "a")
+
+    def test_resume(self):
+        for pattern, text in self.cases:
+            reg = CompiledRegex(pattern)
+            expected = [match.span for match in reg.find_all(text)]
+            for split in (1, len(text) // 3, len(text) // 2):
+                first = reg.scanner()
+                spans = first.feed_spans(text[:split])
+                second = reg.scanner(split)
+                second.resume(text, split, first.state())
+                spans += second.feed_spans(text[split:]) + second.close_spans()
+                self.assertEqual(spans, expected, (pattern, split))
+        reg = CompiledRegex(r"id=\d+")
+        scanner = reg.scanner(6)
+        self.assertEqual(scanner.feed_spans("x id=1 y id=22"), [(8, 12)])
+        threads, last_idle, begin = scanner.state()
+        self.assertTrue(threads)
+        self.assertEqual((last_idle, begin), (15, 15))
+        self.assertEqual(scanner.close_spans(), [(15, 20)])
+
+    def test_bytes(self):
+        for pattern, text in self.cases + [(r"zażółć|ż+", "zażółć żż"), (r"[^a]+", "b\xffc\xe9a")]:
+            reg = CompiledRegex(pattern)
+            expected = [match.span for match in reg.find_all(text)]
+            try:
+                data = text.encode("latin-1")
+            except UnicodeEncodeError:
+                data = text.encode()
+                expected = [match.span for match in reg.find_all(data.decode("latin-1"))]
+            reg.scan_block_size = 3
+            for source in (data, bytearray(data), memoryview(data)):
+                self.assertEqual(list(reg.scan(source)), expected, (pattern, type(source)))
+            scanner = reg.scanner()
+            spans = []
+            for i in range(0, len(data), 2):
+                spans += scanner.feed_spans(data[i:i + 2])
+            self.assertEqual(spans + scanner.close_spans(), expected, pattern)
+
+    def test_scan_file(self):
+        reg = CompiledRegex(r"id=\d+")
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "log.txt"
+            path.write_bytes(b"")
+            self.assertEqual(list(reg.scan_file(path)), [])
+            path.write_bytes(b"".join(f"line {i} id={i}\n".encode() for i in range(1000)))
+            spans = list(reg.scan_file(path))
+        self.assertEqual(len(spans), 1000)
+        self.assertEqual(spans[-1], (15773, 15779))
+
+
+class PackTest(ut.TestCase):
+
+    patterns = [r"id=\d+", r"a*", r"zażółć|ż+", r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})",
+                r"(a|b)*a(a|b){4}"]
+    text = "x id=12 zażółć abbab aaaa adam.kowalski@gmail.pl żż"
+
+    def test_round_trip(self):
+        for pattern in self.patterns:
+            for engine in ("dfa", "lazy"):
+                reg = CompiledRegex(pattern, engine=engine)
+                unpacked = CompiledRegex.unpack(reg.pack())
+                self.assertEqual(unpacked.engine, engine)
+                for method in ("full_match", "match", "search", "find_all", "count"):
+                    self.assertEqual(getattr(unpacked, method)(self.text), getattr(reg, method)(self.text),
+                                     (pattern, engine, method))
+
+    def test_zero_copy(self):
+        reg = CompiledRegex(r"id=\d+")
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "id.rx"
+            path.write_bytes(reg.pack())
+            with open(path, "rb") as file, mmap(file.fileno(), 0, access=ACCESS_READ) as data:
+                unpacked = CompiledRegex.unpack(data)
+                self.assertIsInstance(unpacked.dfa.table, memoryview)
+                self.assertEqual(unpacked.find_all(self.text), reg.find_all(self.text))
+                del unpacked
+
+    def test_invalid(self):
+        reg = CompiledRegex(r"id=\d+")
+        packed = reg.pack()
+        self.assertRaises(ValueError, CompiledRegex.unpack, b"not a regex at all, not at all")
+        self.assertRaises(ValueError, CompiledRegex.unpack, packed[:-1])
+        self.assertRaises(ValueError, CompiledRegex.unpack, packed[:4] + b"\x63\x00" + packed[6:])
+        corrupted = bytearray(packed)
+        corrupted[-len(reg.regex) - len(reg._literal) - 1] = 255  # the last class ID of the prefix
+        self.assertRaises(ValueError, CompiledRegex.unpack, corrupted)
+
+
+class ParallelTest(ut.TestCase):
+
+    def test_same_matches(self):
+        text = "user id=12 ok, aaab " * 50 + "a" * 300 + "b" + " id=7"
+        for pattern in (r"id=\d+", r"a|a*b", r"[a-z]+"):
+            reg = CompiledRegex(pattern)
+            self.assertEqual(reg.find_all(text, workers=3), reg.find_all(text), pattern)
+        reg = CompiledRegex(r"a*")
+        self.assertEqual(reg.find_all(text, workers=3), reg.find_all(text))
+
+    def test_scan_file(self):
+        reg = CompiledRegex(r"id=\d+")
+        with TemporaryDirectory() as directory:
+            path = Path(directory) / "log.txt"
+            path.write_bytes(b"".join(f"line {i} id={i}\n".encode() for i in range(1000)))
+            self.assertEqual(list(reg.scan_file(path, workers=4)), list(reg.scan_file(path)))
+
+
+@ut.skipIf(np is None, "numpy is not installed")
+class BatchTest(ut.TestCase):
+
+    strings = ["ab-123", "abcd-1", "", "x-99999", "ab-1234567", "ab-123 ", "ąb-123", "zz-000"]
+
+    def test_same_results(self):
+        for pattern in (r"[a-z]{2,4}-\d{3,6}", r"\d+", r"a*", r"b|ab"):
+            for engine in ("dfa", "lazy"):
+                reg = CompiledRegex(pattern, engine=engine, lazy_max_states=4)
+                full = reg.full_match_many(self.strings)
+                anywhere = reg.is_match_many(np.array(self.strings))
+                self.assertEqual(full.dtype, np.bool_)
+                self.assertEqual(full.tolist(), [reg.full_match(text) is not None for text in self.strings])
+                self.assertEqual(anywhere.tolist(), [reg.search(text) is not None for text in self.strings])
+
+    def test_empty_batch(self):
+        reg = CompiledRegex(r"a+")
+        self.assertEqual(reg.full_match_many([]).shape, (0,))
+        self.assertEqual(reg.is_match_many([""]).tolist(), [False])
+
+
+class StatsTest(ut.TestCase):
+
+    def test_stages(self):
+        traced = []
+        reg = CompiledRegex(r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})", engine="dfa", trace=traced.append)
+        self.assertEqual(traced, reg.stats)
+        stages = {stage.name: stage for stage in reg.stats}
+        self.assertEqual(list(stages), ["parse", "skeleton", "classes", "enfa", "determinize", "minimize",
+                                        "sinkhole", "table", "start letters"])
+        self.assertEqual(stages["minimize"].states, len(reg.dfa.states))
+        self.assertEqual(stages["minimize"].transitions, len(reg.dfa.transitions))
+        self.assertGreater(stages["determinize"].states, stages["minimize"].states)
+        self.assertGreater(stages["enfa"].transitions, 0)
+        self.assertGreater(stages["minimize"].rounds, 0)
+        self.assertTrue(all(stage.seconds >= 0 and stage.peak_memory is None for stage in reg.stats))
+
+    def test_lazy(self):
+        CompiledRegex.auto_state_limit, limit = 4, CompiledRegex.auto_state_limit
+        try:
+            reg = CompiledRegex(r"(a|b)*a(a|b){4}", codegen=True)
+        finally:
+            CompiledRegex.auto_state_limit = limit
+        self.assertEqual([stage.name for stage in reg.stats],
+                         ["parse", "skeleton", "classes", "enfa", "determinize", "lazy", "codegen", "start letters"])
+        self.assertIsNone(reg.stats[4].states)
+
+    def test_peak_memory(self):
+        import tracemalloc
+        tracemalloc.start()
+        try:
+            untraced = CompiledRegex(r"(a|b)*a(a|b){6}", engine="dfa")
+            block = bytearray(1 << 20)
+            del block
+            peak = tracemalloc.get_traced_memory()[1]
+            CompiledRegex(r"(a|b)*a(a|b){5}", engine="dfa")
+            self.assertGreaterEqual(tracemalloc.get_traced_memory()[1], peak)
+            reg = CompiledRegex(r"(a|b)*a(a|b){6}", engine="dfa", trace=lambda stage: None)
+        finally:
+            tracemalloc.stop()
+        self.assertTrue(all(stage.peak_memory is None for stage in untraced.stats))
+        self.assertTrue(all(stage.peak_memory >= 0 for stage in reg.stats))
+        self.assertGreater(max(stage.peak_memory for stage in reg.stats), 0)
+
+
+class WithoutNumpyTest(ut.TestCase):
+
+    def test_batch_fallback(self):
+        strings = BatchTest.strings
+        with mock.patch("regex.compiled._numpy", return_value=None):
+            for pattern in (r"[a-z]{2,4}-\d{3,6}", r"a*"):
+                reg = CompiledRegex(pattern)
+                self.assertEqual(reg.full_match_many(iter(strings)),
+                                 [reg.full_match(text) is not None for text in strings])
+                self.assertEqual(reg.is_match_many(iter(strings)), [reg.search(text) is not None for text in strings])
+
+    def test_import_is_light(self):
+        heavy = {'numpy', 'concurrent.futures', 'hashlib', 'pathlib'}
+        code = f"import sys, regex; print(sorted({heavy!r} & sys.modules.keys()))"
+        process = run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+        self.assertEqual(process.stdout.strip(), "[]")
+
+
+class LazyEngineTest(ut.TestCase):
+
+    cases = [
+        (r"a+b+", "aaaabbbaaab\naabbaaabbb\nabbab\n"),
+        (r"a*b*", "aaaabbbaaab\naabbaaabbb\nabbab\n"),
+        (r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})", "adam.kowalski@gmail.pl notanemail@ x@y.io"),
+        (r"(a|b)*a(a|b){8}", "abbabababbbaaabababbbbbbbaaaabbbababababbbbaa"),
+        (r"\sy[a-zA-Z]*o\s", "black and yellow! yoo "),
+        (r"|", "ocw"),
+    ]
+
+    def test_same_results(self):
+        for pattern, text in self.cases:
+            eager = CompiledRegex(pattern, engine="dfa")
+            lazy = CompiledRegex(pattern, engine="lazy")
+            self.assertEqual(lazy.engine, "lazy")
+            for method in ("full_match", "match", "search", "find_all"):
+                self.assertEqual(getattr(lazy, method)(text), getattr(eager, method)(text), (pattern, method))
+
+    def test_flush(self):
+        text = "abbabababbbaaabababbbbbbbaaaabbbababababbbbaa" * 20
+        eager = CompiledRegex(r"(a|b)*a(a|b){8}", engine="dfa")
+        lazy = CompiledRegex(r"(a|b)*a(a|b){8}", engine="lazy", lazy_max_states=16)
+        self.assertEqual(lazy.match(text), eager.match(text))
+        self.assertGreater(lazy.dfa.flushes, 0)
+        self.assertLessEqual(len(lazy.dfa), 16)
+        self.assertEqual(lazy.find_all(text), eager.find_all(text))
+
+    def test_bounded_search(self):
+        text = "".join(Random(7).choices("ab ", k=3000))
+        eager = CompiledRegex(r"(a|b)*a(a|b){8}", engine="dfa")
+        lazy = CompiledRegex(r"(a|b)*a(a|b){8}", engine="lazy", lazy_max_states=32)
+        self.assertEqual(lazy.find_all(text), eager.find_all(text))
+        self.assertEqual(lazy.count(text), eager.count(text))
+        self.assertEqual(lazy.search(text[1500:]), eager.search(text[1500:]))
+        self.assertLessEqual(len(lazy.dfa), 32)
+        self.assertLessEqual(len(lazy._forward), 32)
+        self.assertLessEqual(len(lazy._reverse), 32)
+
+    def test_hit_rate(self):
+        text = "abbabababbbaaabababbbbbbbaaaabbbababababbbbaa" * 20
+        lazy = CompiledRegex(r"(a|b)*a(a|b){8}", engine="lazy")
+        lazy.match(text)
+        lazy.match(text)
+        self.assertEqual(lazy.dfa.flushes, 0)
+        self.assertGreater(lazy.dfa.hit_rate, 0.5)
+
+    def test_auto(self):
+        self.assertEqual(CompiledRegex(r"a+b+").engine, "dfa")
+        reg = CompiledRegex(r"(a|b)*a(a|b){20}")
+        self.assertEqual(reg.engine, "lazy")
+        text = "b" * 10 + "a" + "ab" * 10 + "b"
+        self.assertEqual(reg.full_match(text), Match(text, (0, len(text))))
+        self.assertIsNone(reg.full_match("a" * 20))
+
+    def test_invalid_engine(self):
+        self.assertRaises(ValueError, CompiledRegex, r"a", engine="nfa")
+
+
+class ThreadTest(ut.TestCase):
+
+    @staticmethod
+    def run_threads(function, texts: list[str], repeat: int) -> list[list]:
+        results = [[] for _ in texts]
+
+        def work(index: int):
+            for _ in range(repeat):
+                results[index].append(function(texts[index]))
+
+        threads = [Thread(target=work, args=(index,)) for index in range(len(texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_shared_unanchored_automata(self):
+        reg = CompiledRegex(r"a(a|b){14}c", engine="dfa", lazy_max_states=200)
+        texts = ["".join(Random(seed).choices("abc", [10, 10, 1], k=5000)) for seed in range(6)]
+
+        def spans(text: str) -> tuple:
+            return tuple(match.span for match in reg.find_all(text)), reg.count(text), reg.is_match(text)
+
+        expected = [spans(text) for text in texts]
+        for results, spans_of_text in zip(self.run_threads(spans, texts, 2), expected):
+            self.assertEqual(results, [spans_of_text] * 2)
+
+    def test_shared_lazy_engine(self):
+        reg = CompiledRegex(r"(a|b)*a(a|b){10}", engine="lazy", lazy_max_states=100)
+        texts = ["".join(Random(seed).choices("ab", k=1500)) for seed in range(6)]
+
+        def matches(text: str) -> tuple:
+            return reg.match(text).span, reg.full_match(text) is not None, reg.count(text)
+
+        expected = [matches(text) for text in texts]
+        for results, matches_of_text in zip(self.run_threads(matches, texts, 2), expected):
+            self.assertEqual(results, [matches_of_text] * 2)
 
 
 if __name__ == '__main__':
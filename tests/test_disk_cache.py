@@ -0,0 +1,74 @@
+"""Tests for regex/disk_cache.py"""
+
+import unittest as ut
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import mock
+import regex
+from regex.compiled import CompiledRegex
+from regex.disk_cache import DiskCache, get_disk_cache
+
+
+class DiskCacheTest(ut.TestCase):
+
+    def setUp(self):
+        self.directory = TemporaryDirectory()
+        regex.set_cache_dir(self.directory.name)
+
+    def tearDown(self):
+        regex.set_cache_dir(None)
+        self.directory.cleanup()
+
+    def test_loaded_without_compiling(self):
+        text = "x id=12 y id=7"
+        compiled = CompiledRegex(r"id=\d+")
+        self.assertEqual(len(list(Path(self.directory.name).glob("*.rx"))), 1)
+        with mock.patch("regex.compiled.ENFA.get_skeleton", side_effect=AssertionError("compiled again")):
+            loaded = CompiledRegex(r"id=\d+")
+            self.assertEqual(loaded.find_all(text), compiled.find_all(text))
+            self.assertEqual(loaded.engine, "dfa")
+            self.assertEqual([stage.name for stage in loaded.stats], ["unpack"])
+            self.assertRaises(AssertionError, CompiledRegex, r"id=\d+", engine="dfa")
+
+    def test_lazy_engine(self):
+        CompiledRegex(r"(a|b)*a(a|b){4}", engine="lazy")
+        self.assertEqual(list(Path(self.directory.name).glob("*.rx")), [])
+        CompiledRegex.auto_state_limit, limit = 4, CompiledRegex.auto_state_limit
+        try:
+            self.assertEqual(CompiledRegex(r"(a|b)*a(a|b){4}").engine, "lazy")
+            self.assertEqual(CompiledRegex(r"(a|b)*a(a|b){4}").engine, "lazy")
+        finally:
+            CompiledRegex.auto_state_limit = limit
+
+    def test_corrupted_entry(self):
+        CompiledRegex(r"a+b")
+        for path in Path(self.directory.name).glob("*.rx"):
+            path.write_bytes(b"garbage")
+        self.assertEqual(CompiledRegex(r"a+b").find_all("aab"), CompiledRegex(r"a+b", engine="lazy").find_all("aab"))
+
+    def test_corrupted_table(self):
+        table = bytes(memoryview(CompiledRegex(r"a+b").dfa.table).cast("B"))
+        for path in Path(self.directory.name).glob("*.rx"):
+            contents = path.read_bytes()
+            path.write_bytes(contents.replace(table, (1000).to_bytes(4, "little") + table[4:]))
+        loaded = CompiledRegex(r"a+b")
+        self.assertIn("parse", [stage.name for stage in loaded.stats])
+        self.assertEqual([match.span for match in loaded.find_all("aab")], [(0, 3)])
+
+    def test_eviction(self):
+        cache = DiskCache(self.directory.name, max_size=100)
+        cache.put("a", b"x" * 60)
+        cache.put("b", b"y" * 60)
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), b"y" * 60)
+        self.assertEqual(list(Path(self.directory.name).glob(".*")), [])
+
+    def test_off(self):
+        regex.set_cache_dir(None)
+        self.assertIsNone(get_disk_cache())
+        CompiledRegex(r"q+")
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [])
+
+
+if __name__ == '__main__':
+    ut.main()
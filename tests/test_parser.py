@@ -481,5 +481,24 @@ class ParserTest(ut.TestCase):
         )
 
 
+class RequiredLiteralTest(ut.TestCase):
+
+    def test_literals(self):
+        cases = {
+            r"([a-z0-9_\.]+)@([-\da-z\.]+)\.([a-z\.]{2,6})": "@",
+            r"\w+://\w+": "://",
+            r"ERROR: [a-z ]+": "ERROR: ",
+            r"x(ab){2,3}y": "xabab",
+            r"(abc)+d": "abcd",
+            r"(foo|foobar)x": "foo",
+            r"\d+\.\d+ms": "ms",
+            r"x(a|b)*y": "x",
+            r"a*": "",
+            r"[ab]": "",
+        }
+        for re, literal in cases.items():
+            self.assertEqual(par.parse(re).get_required_literal(), literal, re)
+
+
 if __name__ == '__main__':
     ut.main()
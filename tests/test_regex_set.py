@@ -0,0 +1,63 @@
+"""Tests for regex/regex_set.py"""
+
+import unittest as ut
+from random import Random
+from threading import Thread
+from regex.compiled import CompiledRegex
+from regex.regex_set import RegexSet
+
+
+class RegexSetTest(ut.TestCase):
+
+    patterns = [r"id=\d+", r"[a-z]+@[a-z]+\.pl", r"ERROR|FATAL", r"a*b", r"x?"]
+    texts = ["user id=12 ok", "write to adam@poczta.pl", "FATAL: disk", "aaab", "", "zzz", "ERRO id="]
+
+    def test_matches(self):
+        regex_set = RegexSet(self.patterns)
+        regexes = [CompiledRegex(pattern) for pattern in self.patterns]
+        for text in self.texts:
+            expected = [i for i, reg in enumerate(regexes) if reg.search(text)]
+            self.assertEqual(regex_set.matches(text), expected, text)
+            self.assertEqual(regex_set.is_match(text), bool(expected), text)
+
+    def test_no_empty_matches(self):
+        regex_set = RegexSet(self.patterns[:4])
+        self.assertEqual(regex_set.matches("id=7 and b"), [0, 3])
+        self.assertFalse(regex_set.is_match("nothing here"))
+        self.assertEqual(RegexSet([]).matches("abc"), [])
+
+    def test_finditer(self):
+        regex_set = RegexSet([r"[a-z]+", r"if|else", r"\d+", r"[a-z]+\d"])
+        found = [(pattern_id, match.get_str) for pattern_id, match in regex_set.finditer("if x1 else 42 y")]
+        self.assertEqual(found, [(0, "if"), (3, "x1"), (0, "else"), (2, "42"), (0, "y")])
+
+    def test_flush(self):
+        patterns = [rf"k{i}=[a-z]+" for i in range(20)]
+        regex_set = RegexSet(patterns, lazy_max_states=8)
+        text = " ".join(f"k{i}=v" for i in range(0, 20, 3))
+        self.assertEqual(regex_set.matches(text), list(range(0, 20, 3)))
+        self.assertGreater(regex_set._unanchored.flushes, 0)
+
+    def test_threads(self):
+        patterns = [rf"k{i}=[a-z]+" for i in range(20)] + [r"a(a|b){6}c"]
+        regex_set = RegexSet(patterns, lazy_max_states=20)
+        texts = [" ".join(f"k{i}=v" for i in Random(seed).sample(range(20), 8)) + " "
+                 + "".join(Random(seed).choices("abc", k=300)) for seed in range(6)]
+        expected = [(regex_set.matches(text), regex_set.is_match(text)) for text in texts]
+        results = [[] for _ in texts]
+
+        def work(index: int):
+            for _ in range(20):
+                results[index].append((regex_set.matches(texts[index]), regex_set.is_match(texts[index])))
+
+        threads = [Thread(target=work, args=(index,)) for index in range(len(texts))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for result, matches in zip(results, expected):
+            self.assertEqual(result, [matches] * 20)
+
+
+if __name__ == '__main__':
+    ut.main()